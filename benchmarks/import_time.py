@@ -0,0 +1,62 @@
+"""Import time of the ITS Katowice integration package.
+
+Runs each import in a fresh interpreter with ``-X importtime`` and reports the cumulative
+time of the integration package and which heavy dependencies were loaded with it.
+
+Usage: python -m benchmarks.import_time [--runs N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+TARGETS = {
+    'integration': 'custom_components.ktw_its',
+    'parking zones (trackers configured)': 'custom_components.ktw_its.api.parking_zones',
+}
+HEAVY_MODULES = ('shapely', 'marshmallow', 'numpy')
+
+
+def import_once(module: str) -> tuple[float, set[str]]:
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative_us = 0
+    loaded: set[str] = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        if not cumulative.isdigit():
+            continue
+        if name == module:
+            cumulative_us = int(cumulative)
+        loaded.add(name.split('.')[0])
+    return cumulative_us / 1000, loaded & set(HEAVY_MODULES)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    for label, module in TARGETS.items():
+        timings = []
+        heavy: set[str] = set()
+        for _ in range(args.runs):
+            elapsed_ms, heavy = import_once(module)
+            timings.append(elapsed_ms)
+        print(
+            f"{label:<40} median {statistics.median(timings):8.1f} ms"
+            f"  min {min(timings):8.1f} ms  heavy: {', '.join(sorted(heavy)) or '-'}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""Load test for the tracker-event and camera-view paths.
+
+Drives KtwItsApi.on_entity_state_change with synthetic GPS streams over a synthetic grid of
+parking zones, and KtwItsApi.get_camera_image with concurrent viewers against a local fake
+HTTP client. Each viewer pauses for an exponentially distributed think time between views, so the
+camera figures describe the integration under that offered load rather than a busy loop. Reports
+throughput, p50/p99 latency, event-loop lag and upstream request counts.
+
+Usage: python -m benchmarks.load_test [--trackers N] [--events N] [--zones N] [--viewers N] ...
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import statistics
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from custom_components.ktw_its.api.api import KtwItsApi
+from custom_components.ktw_its.api.camera import CameraApi
+from custom_components.ktw_its.api.http_client import HttpClientInterface
+from custom_components.ktw_its.api.messenger import EventBus, ItsEvent
+from custom_components.ktw_its.api.parking_zones import ParkingZonesApi, ParkingZoneRepository
+from custom_components.ktw_its.api.traffic import TrafficApi
+from custom_components.ktw_its.api.weather import WeatherApi
+
+_LOGGER = logging.getLogger(__name__)
+
+MIN_LATITUDE, MIN_LONGITUDE = 50.22, 18.95
+MAX_LATITUDE, MAX_LONGITUDE = 50.30, 19.10
+
+
+class FakeHttpClient(HttpClientInterface):
+    """Serves synthetic ITS payloads with an optional simulated upstream latency."""
+
+    def __init__(self, zones: int, cameras: int, latency: float, image_size: int) -> None:
+        self.requests: Counter[str] = Counter()
+        self.__latency: float = latency
+        self.__zones_json: str = json.dumps(synthetic_zones(zones))
+        self.__image: bytes = random.randbytes(image_size)
+        self.__cameras: int = cameras
+
+    async def make_request(self, url: str) -> str:
+        await self.__request(url)
+        if url.endswith('/api/parkingZones'):
+            return self.__zones_json
+        if match := re.search(r'/api/cameras/(\d+)/images$', url):
+            now = datetime.now(timezone.utc).isoformat()
+            return json.dumps({'images': [
+                {
+                    'filename': f'{match.group(1)}_{i}.jpg',
+                    'addTime': now,
+                    'size': len(self.__image),
+                    'mimeType': 'image/jpeg',
+                    'code': str(i),
+                    'digest': f'{match.group(1)}-{i}-{int(time.time()) // 60}',
+                }
+                for i in range(4)
+            ]})
+        raise ValueError(url)
+
+    async def make_request_bytes(self, url: str) -> bytes:
+        await self.__request(url)
+        return self.__image
+
+    async def __request(self, url: str) -> None:
+        self.requests[re.sub(r'\d+', '{id}', url)] += 1
+        if self.__latency:
+            await asyncio.sleep(self.__latency)
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic sleep wakes up, i.e. how long the loop was blocked."""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.__interval: float = interval
+        self.lags: list[float] = []
+        self.__task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self.__task = asyncio.create_task(self.__run())
+
+    async def stop(self) -> None:
+        if self.__task is not None:
+            self.__task.cancel()
+
+    async def __run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.__interval
+            await asyncio.sleep(self.__interval)
+            self.lags.append(max(loop.time() - expected, 0.0))
+
+
+def synthetic_zones(count: int) -> dict:
+    side = max(int(count ** 0.5), 1)
+    lat_step = (MAX_LATITUDE - MIN_LATITUDE) / side
+    lon_step = (MAX_LONGITUDE - MIN_LONGITUDE) / side
+    features = []
+    for index in range(count):
+        lat = MIN_LATITUDE + (index // side) * lat_step
+        lon = MIN_LONGITUDE + (index % side) * lon_step
+        features.append({
+            'type': 'Feature',
+            'properties': {'code': f'zone_{index}'},
+            'geometry': {'type': 'Polygon', 'coordinates': [[
+                [lon, lat], [lon + lon_step, lat], [lon + lon_step, lat + lat_step], [lon, lat + lat_step], [lon, lat]
+            ]]},
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def gps_state(latitude: float, longitude: float) -> SimpleNamespace:
+    return SimpleNamespace(attributes={'latitude': latitude, 'longitude': longitude})
+
+
+def percentiles(samples: list[float]) -> str:
+    if not samples:
+        return 'n/a'
+    ordered = sorted(samples)
+    p99 = ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)]
+    return f'p50 {statistics.median(ordered) * 1000:8.3f} ms  p99 {p99 * 1000:8.3f} ms  max {ordered[-1] * 1000:8.3f} ms'
+
+
+async def run_trackers(api: KtwItsApi, trackers: int, events: int, batch: int) -> list[float]:
+    positions = {
+        f'device_tracker.synthetic_{i}': (
+            random.uniform(MIN_LATITUDE, MAX_LATITUDE), random.uniform(MIN_LONGITUDE, MAX_LONGITUDE)
+        )
+        for i in range(trackers)
+    }
+    latencies: list[float] = []
+    entity_ids = list(positions)
+    for sent in range(events):
+        entity_id = entity_ids[sent % trackers]
+        latitude, longitude = positions[entity_id]
+        new_position = (latitude + random.gauss(0, 0.0005), longitude + random.gauss(0, 0.0005))
+        positions[entity_id] = new_position
+        event = SimpleNamespace(data={
+            'entity_id': entity_id,
+            'old_state': gps_state(latitude, longitude),
+            'new_state': gps_state(*new_position),
+        })
+        started = time.perf_counter()
+        api.on_entity_state_change(event)  # type: ignore[arg-type]
+        latencies.append(time.perf_counter() - started)
+        if sent % batch == 0:
+            # State change callbacks arrive interleaved with other loop work.
+            await asyncio.sleep(0)
+    return latencies
+
+
+async def run_viewers(
+        api: KtwItsApi, viewers: int, cameras: int, duration: float, think_time: float
+) -> list[float]:
+    latencies: list[float] = []
+    deadline = time.perf_counter() + duration
+
+    async def viewer() -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await api.get_camera_image(random.randrange(cameras), random.randrange(4))
+            latencies.append(time.perf_counter() - started)
+            # Cache hits complete without suspending; without a pause each viewer would spin and starve the loop,
+            # and the benchmark would measure its own busy loop. Pauses are exponential around think_time.
+            pause = random.expovariate(1 / think_time) if think_time > 0 else 0.0
+            await asyncio.sleep(max(min(pause, deadline - time.perf_counter()), 0.0))
+
+    await asyncio.gather(*(viewer() for _ in range(viewers)))
+    return latencies
+
+
+async def main(args: argparse.Namespace) -> None:
+    http_client = FakeHttpClient(
+        zones=args.zones, cameras=args.cameras, latency=args.latency, image_size=args.image_size
+    )
+    event_bus = EventBus(logger=_LOGGER, max_queue_size=args.events)
+    fired: Counter[str] = Counter()
+    event_bus.subscribe(ItsEvent, lambda message: fired.update([message.event_data()['type']]))
+    parking_zones_api = ParkingZonesApi(
+        http_client=http_client,
+        repository=ParkingZoneRepository(logger=_LOGGER),
+        event_bus=event_bus,
+        logger=_LOGGER,
+    )
+    api = KtwItsApi(
+        weather_api=WeatherApi(http_client=http_client, logger=_LOGGER),
+        traffic_api=TrafficApi(http_client=http_client, logger=_LOGGER),
+        camera_api=CameraApi(http_client=http_client, logger=_LOGGER),
+        parking_zones_api=parking_zones_api,
+    )
+    await parking_zones_api.fetch_data()
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    latencies = await run_trackers(api, args.trackers, args.events, args.batch)
+    await event_bus.stop()
+    elapsed = time.perf_counter() - started
+    await monitor.stop()
+    print(f'tracker events: {args.events} over {args.zones} zones in {elapsed:.2f} s '
+          f'({args.events / elapsed:,.0f} events/s, {args.events / elapsed * 60:,.0f} events/min)')
+    print(f'  latency   {percentiles(latencies)}')
+    print(f'  loop lag  {percentiles(monitor.lags)}')
+    print(f'  fired     {dict(fired)}')
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    latencies = await run_viewers(api, args.viewers, args.cameras, args.duration, args.think_time)
+    elapsed = time.perf_counter() - started
+    await monitor.stop()
+    # With think time the achieved rate is bounded by the offered one; a large gap means views queue up.
+    offered = f'{args.viewers / args.think_time:,.0f} views/s offered' if args.think_time > 0 else 'closed loop'
+    print(f'camera views: {len(latencies)} by {args.viewers} viewers in {elapsed:.2f} s '
+          f'({len(latencies) / elapsed:,.0f} views/s, {offered} with {args.think_time:g} s think time)')
+    print(f'  latency   {percentiles(latencies)}')
+    print(f'  loop lag  {percentiles(monitor.lags)}')
+
+    print('upstream requests:')
+    for url, count in sorted(http_client.requests.items()):
+        print(f'  {count:>8}  {url}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trackers', type=int, default=200)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--batch', type=int, default=50, help='events handled between loop yields')
+    parser.add_argument('--zones', type=int, default=400)
+    parser.add_argument('--viewers', type=int, default=30)
+    parser.add_argument('--cameras', type=int, default=40)
+    parser.add_argument('--duration', type=float, default=5.0, help='camera viewing time in seconds')
+    parser.add_argument('--think-time', type=float, default=1.0,
+                        help='mean pause of a viewer between views in seconds; 0 only yields to the loop')
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated upstream latency in seconds')
+    parser.add_argument('--image-size', type=int, default=150_000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,131 @@
+"""Memory footprint of the ITS Katowice models at city scale.
+
+Usage: python -m benchmarks.memory [--segments N] [--cameras N] [--zones N] [--vertices N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import random
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime, timezone
+
+from custom_components.ktw_its.api import camera, geo, traffic
+from custom_components.ktw_its.api.parking_zones import ParkingZone
+from custom_components.ktw_its.dto import KtwItsCameraImageDto, KtwItsSensorDto
+from custom_components.ktw_its.image import KtwItsImageEntityDescription
+from custom_components.ktw_its.sensor import KtwItsSensorEntityDescription
+
+
+def measure(label: str, build: Callable[[], object]) -> None:
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<40} {current / 1024:>10.1f} KiB (peak {peak / 1024:.1f} KiB)")
+    del result
+
+
+def build_segments(count: int) -> list[traffic.Feature]:
+    now = datetime.now(timezone.utc)
+    return [
+        traffic.Feature(
+            type='Feature',
+            properties=traffic.Properties(
+                name=f'Segment {code}',
+                description=f'Description {code}',
+                code=code,
+                data=traffic.PropertiesData(
+                    avg_speed=random.randint(5, 70),
+                    avg_time=random.uniform(5, 120),
+                    traffic=random.randint(0, 200),
+                    traffic_period=15,
+                    date_time=now,
+                    color='green',
+                ),
+            ),
+            geometry=traffic.Geometry(
+                type='MultiLineString',
+                coordinates=[[[19.0, 50.25], [19.01, 50.26]], [[19.01, 50.26], [19.02, 50.27]]],
+            ),
+        )
+        for code in range(count)
+    ]
+
+
+def build_segment_dtos(count: int) -> list[KtwItsSensorDto]:
+    return [
+        KtwItsSensorDto(
+            state=random.randint(5, 70),
+            entity_description=KtwItsSensorEntityDescription(group='traffic', key=f'ktw_its_{code}_avg_speed'),
+        )
+        for code in range(count)
+    ]
+
+
+def build_cameras(count: int) -> list[KtwItsCameraImageDto]:
+    return [
+        KtwItsCameraImageDto(
+            entity_description=KtwItsImageEntityDescription(
+                key=f'ktw_its_camera_{camera_id}_{image_id}__image',
+                group='camera',
+                camera_id=camera_id,
+                camera_name=f'camera_{camera_id}',
+                camera_description='',
+                image_id=image_id,
+            ),
+        )
+        for camera_id in range(count)
+        for image_id in range(4)
+    ]
+
+
+def build_camera_features(count: int) -> list[camera.Feature]:
+    return [
+        camera.Feature(
+            type='Feature',
+            properties=camera.Properties(
+                id=camera_id, name=f'camera_{camera_id}', description='', state=1, type='ptz', image=''
+            ),
+            geometry=camera.Geometry(type='Point', coordinates=[19.0, 50.25]),
+        )
+        for camera_id in range(count)
+    ]
+
+
+def build_zones(zones: int, vertices: int) -> list[ParkingZone]:
+    return [
+        ParkingZone(
+            code=f'zone_{code}',
+            polygon=geo.Polygon.from_geometry(geo.Geometry(
+                type='Polygon',
+                coordinates=[[[19.0 + random.random() / 100, 50.25 + random.random() / 100] for _ in range(vertices)]],
+            )),
+        )
+        for code in range(zones)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--segments', type=int, default=500)
+    parser.add_argument('--cameras', type=int, default=150)
+    parser.add_argument('--zones', type=int, default=300)
+    parser.add_argument('--vertices', type=int, default=200)
+    args = parser.parse_args()
+
+    measure(f'{args.segments} traffic features', lambda: build_segments(args.segments))
+    measure(f'{args.segments * 5} traffic sensor DTOs', lambda: build_segment_dtos(args.segments * 5))
+    measure(f'{args.cameras} camera features', lambda: build_camera_features(args.cameras))
+    measure(f'{args.cameras * 4} camera image DTOs', lambda: build_cameras(args.cameras))
+    measure(
+        f'{args.zones} zones x {args.vertices} vertices',
+        lambda: build_zones(args.zones, args.vertices)
+    )
+
+
+if __name__ == '__main__':
+    main()
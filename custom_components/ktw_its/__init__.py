@@ -10,15 +10,9 @@ from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.event import async_track_state_change_event
 
-from custom_components.ktw_its.api.api import KtwItsApi
-from custom_components.ktw_its.api.camera import CameraApi
-from custom_components.ktw_its.api.http_client import HttpClient
-from custom_components.ktw_its.api.messenger import EventBus
-from custom_components.ktw_its.api.parking_zones import ParkingZonesApi, ParkingZoneRepository
-from custom_components.ktw_its.api.traffic import TrafficApi
-from custom_components.ktw_its.api.weather import WeatherApi
-from custom_components.ktw_its.const import DOMAIN
-from custom_components.ktw_its.coordinator import KtwItsDataUpdateCoordinator
+from custom_components.ktw_its.const import DOMAIN, DATA_HUB, CONF_DEVICE_TRACKERS
+from custom_components.ktw_its.hub import KtwItsHub
+from custom_components.ktw_its.timelapse import KtwItsTimelapseView
 
 PLATFORMS: list[Platform] = [
     Platform.IMAGE,
@@ -29,34 +23,21 @@ _LOGGER = logging.getLogger(__name__)
 
 
 async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
-    http_client = HttpClient(logger=_LOGGER)
-    event_bus = hass.bus
-    ktw_its_coordinator = KtwItsDataUpdateCoordinator(
-        hass=hass,
-        api=KtwItsApi(
-            weather_api=WeatherApi(http_client=http_client, logger=_LOGGER),
-            traffic_api=TrafficApi(http_client=http_client, logger=_LOGGER),
-            camera_api=CameraApi(http_client=http_client, logger=_LOGGER),
-            parking_zones_api=ParkingZonesApi(
-                http_client=http_client,
-                repository=ParkingZoneRepository(logger=_LOGGER),
-                logger=_LOGGER,
-                event_bus=event_bus
-            )
-        ),
-        logger=_LOGGER
-    )
-    await ktw_its_coordinator.async_config_entry_first_refresh()
+    hub = KtwItsHub.async_get(hass=hass, logger=_LOGGER)
+    coordinators = await hub.async_subscribe(config_entry)
 
     hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN][config_entry.entry_id] = ktw_its_coordinator
+    hass.data[DOMAIN][config_entry.entry_id] = coordinators
 
     await hass.config_entries.async_forward_entry_setups(config_entry, PLATFORMS)
+    config_entry.async_on_unload(config_entry.add_update_listener(options_update_listener))
 
-    entity_ids = config_entry.options.get("device_trackers")
+    entity_ids = config_entry.options.get(CONF_DEVICE_TRACKERS)
     if entity_ids:
-        async_track_state_change_event(
-            hass, entity_ids, ktw_its_coordinator.on_entity_state_change
+        config_entry.async_on_unload(
+            async_track_state_change_event(
+                hass, entity_ids, hub.on_entity_state_change
+            )
         )
 
     return True
@@ -66,6 +47,8 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
         hass.data[DOMAIN].pop(entry.entry_id)
+        hub: KtwItsHub = hass.data[DATA_HUB]
+        await hub.async_unsubscribe(entry.entry_id)
 
     return unload_ok
 
@@ -84,4 +67,5 @@ async def async_migrate_entry(hass, config_entry: ConfigEntry):
 async def async_setup(hass: core.HomeAssistant, config: dict) -> bool:
     """Set up the GitHub Custom component from yaml configuration."""
     hass.data.setdefault(DOMAIN, {})
+    hass.http.register_view(KtwItsTimelapseView())
     return True
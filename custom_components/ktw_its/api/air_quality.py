@@ -0,0 +1,141 @@
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+HOURS = 24
+# Share of hourly values a window needs before its aggregate is reported (EU air quality data capture rule).
+MIN_COVERAGE = 0.75
+
+
+class HourlyRing:
+    """Fixed-size ring of hourly sums and counts covering the last 24 hours."""
+    __slots__ = ('sums', 'counts', 'hours')
+
+    def __init__(self) -> None:
+        self.sums: array = array('d', [0.0] * HOURS)
+        self.counts: array = array('l', [0] * HOURS)
+        self.hours: array = array('q', [-1] * HOURS)
+
+    def add(self, hour: int, value: float) -> None:
+        slot = hour % HOURS
+        if self.hours[slot] != hour:
+            self.hours[slot] = hour
+            self.sums[slot] = 0.0
+            self.counts[slot] = 0
+        self.sums[slot] += value
+        self.counts[slot] += 1
+
+    def hourly_mean(self, hour: int) -> float | None:
+        slot = hour % HOURS
+        if self.hours[slot] != hour or self.counts[slot] == 0:
+            return None
+        return self.sums[slot] / self.counts[slot]
+
+    def mean(self, last_hour: int, window: int) -> float | None:
+        values = [self.hourly_mean(hour) for hour in range(last_hour - window + 1, last_hour + 1)]
+        present = [value for value in values if value is not None]
+        if len(present) < window * MIN_COVERAGE:
+            return None
+        return sum(present) / len(present)
+
+    def max_running_mean(self, last_hour: int, window: int) -> float | None:
+        means = [
+            self.mean(end_hour, window) for end_hour in range(last_hour - HOURS + window, last_hour + 1)
+        ]
+        present = [value for value in means if value is not None]
+        return max(present) if present else None
+
+    def as_dict(self) -> dict[str, list]:
+        return {'sums': self.sums.tolist(), 'counts': self.counts.tolist(), 'hours': self.hours.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, list]) -> "HourlyRing":
+        ring = HourlyRing()
+        if all(len(data.get(name, [])) == HOURS for name in ('sums', 'counts', 'hours')):
+            ring.sums = array('d', data['sums'])
+            ring.counts = array('l', data['counts'])
+            ring.hours = array('q', data['hours'])
+        return ring
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class Aggregate:
+    key: str
+    name: str
+    pollutant: str
+    window: int
+    running_max: bool = False
+
+
+AGGREGATES: tuple[Aggregate, ...] = (
+    Aggregate(key='pm10_24h_mean', name='PM10 24h mean', pollutant='pm10', window=24),
+    Aggregate(key='pm2_5_24h_mean', name='PM2.5 24h mean', pollutant='pm2_5', window=24),
+    Aggregate(key='no2_24h_mean', name='Nitrogen dioxide 24h mean', pollutant='no2', window=24),
+    Aggregate(key='so2_24h_mean', name='Sulphur dioxide 24h mean', pollutant='so2', window=24),
+    Aggregate(key='o3_8h_max', name='Ozone 8h mean maximum', pollutant='o3', window=8, running_max=True),
+    Aggregate(key='co_8h_max', name='Carbon monoxide 8h mean maximum', pollutant='co', window=8, running_max=True),
+    Aggregate(key='aqi_24h_mean', name='Air quality index 24h mean', pollutant='aqi', window=24),
+)
+
+POLLUTANTS: tuple[str, ...] = tuple(sorted({aggregate.pollutant for aggregate in AGGREGATES}))
+
+
+class AirQualityAggregator:
+    """Rolling per-pollutant aggregates updated once per new weather reading, in constant memory."""
+
+    def __init__(self) -> None:
+        self.__rings: dict[str, HourlyRing] = {pollutant: HourlyRing() for pollutant in POLLUTANTS}
+        self.__last_date: datetime | None = None
+        self.revision: int = 0
+
+    @property
+    def last_date(self) -> datetime | None:
+        return self.__last_date
+
+    def add(self, date: datetime, values: dict[str, float]) -> bool:
+        if self.__last_date is not None and date <= self.__last_date:
+            return False
+
+        hour = int(date.timestamp() // 3600)
+        for pollutant, ring in self.__rings.items():
+            value = values.get(pollutant)
+            if value is not None:
+                ring.add(hour, value)
+        self.__last_date = date
+        self.revision += 1
+
+        return True
+
+    def values(self) -> dict[str, float | None]:
+        if self.__last_date is None:
+            return {aggregate.key: None for aggregate in AGGREGATES}
+
+        hour = int(self.__last_date.timestamp() // 3600)
+        values: dict[str, float | None] = {}
+        for aggregate in AGGREGATES:
+            ring = self.__rings[aggregate.pollutant]
+            if aggregate.running_max:
+                value = ring.max_running_mean(hour, aggregate.window)
+            else:
+                value = ring.mean(hour, aggregate.window)
+            values[aggregate.key] = round(value, 2) if value is not None else None
+
+        return values
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'last_date': self.__last_date.isoformat() if self.__last_date is not None else None,
+            'rings': {pollutant: ring.as_dict() for pollutant, ring in self.__rings.items()},
+        }
+
+    def restore(self, data: dict[str, Any] | None) -> None:
+        if not data:
+            return
+
+        rings = data.get('rings', {})
+        for pollutant in POLLUTANTS:
+            if pollutant in rings:
+                self.__rings[pollutant] = HourlyRing.from_dict(rings[pollutant])
+        if data.get('last_date'):
+            self.__last_date = datetime.fromisoformat(data['last_date'])
@@ -1,13 +1,19 @@
 # coding=utf-8
+from __future__ import annotations
+
 import logging
+from typing import TYPE_CHECKING
 
 from homeassistant.core import EventStateChangedData, Event
 
-from custom_components.ktw_its.api.camera import CameraApi
-from custom_components.ktw_its.api.parking_zones import ParkingZonesApi
-from custom_components.ktw_its.api.traffic import TrafficApi
-from custom_components.ktw_its.api.weather import WeatherApi
-from custom_components.ktw_its.dto import KtwItsCameraImageDto, KtwItsSensorDto
+from custom_components.ktw_its.api.scheduler import Priority, prioritized
+
+if TYPE_CHECKING:
+    from custom_components.ktw_its.api.camera import CameraApi
+    from custom_components.ktw_its.api.parking_zones import ParkingZonesApi
+    from custom_components.ktw_its.api.traffic import TrafficApi
+    from custom_components.ktw_its.api.weather import WeatherApi
+    from custom_components.ktw_its.dto import KtwItsCameraImageDto, KtwItsSensorDto
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -19,24 +25,61 @@ class KtwItsApi:
                  weather_api: WeatherApi,
                  traffic_api: TrafficApi,
                  camera_api: CameraApi,
-                 parking_zones_api: ParkingZonesApi
+                 parking_zones_api: ParkingZonesApi | None = None
                  ) -> None:
         self.__weather_api: WeatherApi = weather_api
         self.__traffic_api: TrafficApi = traffic_api
         self.__camera_api: CameraApi = camera_api
-        self.__parking_zones_api: ParkingZonesApi = parking_zones_api
+        self.__parking_zones_api: ParkingZonesApi | None = parking_zones_api
+
+    @property
+    def has_parking_zones(self) -> bool:
+        return self.__parking_zones_api is not None
+
+    def set_parking_zones_api(self, parking_zones_api: ParkingZonesApi) -> None:
+        self.__parking_zones_api = parking_zones_api
+
+    def diagnostics(self) -> dict:
+        return {
+            'weather': self.__weather_api.diagnostics(),
+            'traffic': self.__traffic_api.diagnostics(),
+            **self.__camera_api.diagnostics(),
+            'parking_zones': self.__parking_zones_api.diagnostics() if self.__parking_zones_api is not None else None,
+        }
+
+    async def fetch_weather_data(self) -> dict[str, KtwItsSensorDto]:
+        return await self.__weather_api.fetch_data()
 
-    async def fetch_data(self, groups: set | None = None) -> dict[str, KtwItsSensorDto | KtwItsCameraImageDto]:
-        data: dict[str, KtwItsSensorDto | KtwItsCameraImageDto] = {}
-        data.update(await self.__weather_api.fetch_data())
-        data.update(await self.__traffic_api.fetch_data())
-        data.update(await self.__camera_api.fetch_data())
-        await self.__parking_zones_api.fetch_data()
+    async def fetch_traffic_data(self) -> dict[str, KtwItsSensorDto]:
+        return await self.__traffic_api.fetch_data()
 
-        return data
+    async def fetch_camera_data(self) -> dict[str, KtwItsCameraImageDto]:
+        return await self.__camera_api.fetch_data()
+
+    async def fetch_parking_zones_data(self) -> dict:
+        if self.__parking_zones_api is not None:
+            await self.__parking_zones_api.fetch_data()
+        # Zones have no entities; the refresh only keeps the spatial index current.
+        return {}
+
+    def set_selection(self, segment_codes: set[int] | None, camera_ids: set[int] | None) -> None:
+        self.__traffic_api.set_selection(segment_codes)
+        self.__camera_api.set_selection(camera_ids)
+
+    async def fetch_sources(self) -> tuple[dict[int, str], dict[int, str]]:
+        with prioritized(Priority.BACKGROUND):
+            return await self.__traffic_api.fetch_segments(), await self.__camera_api.fetch_cameras()
 
     async def get_camera_image(self, camera_id: int, image_id: int) -> bytes | None:
-        return await self.__camera_api.get_camera_image(camera_id, image_id)
+        with prioritized(Priority.INTERACTIVE):
+            return await self.__camera_api.get_camera_image(camera_id, image_id)
+
+    def camera_slot(self, camera_id: int, image_id: int) -> KtwItsCameraImageDto | None:
+        return self.__camera_api.camera_slot(camera_id, image_id)
+
+    def camera_slots_state(self, camera_id: int) -> tuple:
+        return self.__camera_api.camera_slots_state(camera_id)
 
     def on_entity_state_change(self, event: Event[EventStateChangedData]):
-        self.__parking_zones_api.on_entity_state_change(event)
+        if self.__parking_zones_api is not None:
+            self.__parking_zones_api.on_entity_state_change(event)
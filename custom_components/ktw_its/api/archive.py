@@ -0,0 +1,290 @@
+import asyncio
+import mmap
+import os
+import struct
+import time
+from bisect import bisect_left, bisect_right
+from collections.abc import AsyncIterator, Generator
+from datetime import datetime, timedelta, timezone
+from logging import Logger
+
+from custom_components.ktw_its.api.clock import ClockInterface, SystemClock
+
+# Index record: frame timestamp, offset and length of the frame in the segment file.
+INDEX_RECORD = struct.Struct('<dII')
+SEGMENT_SUFFIX = '.seg'
+INDEX_SUFFIX = '.idx'
+# Offsets are 32 bit; segments rotate long before that.
+SEGMENT_MAX_BYTES = 16 * 1024 * 1024
+
+DEFAULT_RETENTION = timedelta(hours=24)
+DEFAULT_QUOTA_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_PENDING_FRAMES = 32
+PRUNE_INTERVAL_SECONDS = 600
+MJPEG_BOUNDARY = 'frame'
+
+
+def _slot_directory(root: str, camera_id: int, image_id: int) -> str:
+    return os.path.join(root, f'{camera_id}-{image_id}')
+
+
+def _segment_starts(directory: str) -> list[int]:
+    """Start timestamps of the slot's segments, oldest first."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in names if name.endswith(SEGMENT_SUFFIX))
+
+
+def _read_index(path: str) -> list[tuple[float, int, int]]:
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        return []
+    # A record cut short by a crash mid-append is ignored.
+    usable = len(data) - len(data) % INDEX_RECORD.size
+    return list(INDEX_RECORD.iter_unpack(data[:usable]))
+
+
+def _last_timestamp(path: str) -> float | None:
+    try:
+        with open(path, 'rb') as file:
+            size = file.seek(0, os.SEEK_END)
+            if size < INDEX_RECORD.size:
+                return None
+            file.seek(size - size % INDEX_RECORD.size - INDEX_RECORD.size)
+            return INDEX_RECORD.unpack(file.read(INDEX_RECORD.size))[0]
+    except FileNotFoundError:
+        return None
+
+
+def append_frame(root: str, camera_id: int, image_id: int, timestamp: float, content: bytes) -> bool:
+    """Append a frame to the slot's newest segment, starting a new one when it is full; runs in the executor.
+
+    Returns False for a frame that is not newer than the last stored one, e.g. after a restart.
+    """
+    directory = _slot_directory(root, camera_id, image_id)
+    os.makedirs(directory, exist_ok=True)
+    starts = _segment_starts(directory)
+    if starts:
+        base = os.path.join(directory, str(starts[-1]))
+        last_timestamp = _last_timestamp(base + INDEX_SUFFIX)
+        if last_timestamp is not None and timestamp <= last_timestamp:
+            return False
+        if os.path.getsize(base + SEGMENT_SUFFIX) + len(content) > SEGMENT_MAX_BYTES:
+            base = os.path.join(directory, str(max(int(timestamp), starts[-1] + 1)))
+    else:
+        base = os.path.join(directory, str(int(timestamp)))
+
+    with open(base + SEGMENT_SUFFIX, 'ab') as segment:
+        offset = segment.tell()
+        segment.write(content)
+    # The index is written last, so a frame is only visible once it is complete.
+    with open(base + INDEX_SUFFIX, 'ab') as index:
+        index.write(INDEX_RECORD.pack(timestamp, offset, len(content)))
+    return True
+
+
+def read_frames(
+        root: str, camera_id: int, image_id: int, start: float, end: float, max_frames: int
+) -> Generator[tuple[float, bytes], None, None]:
+    """Frames of a slot with start <= timestamp <= end, evenly thinned out to at most max_frames.
+
+    Only the indexes are read up front; frames are sliced out of the mapped segment one at a time, so memory
+    stays at a single frame however long the period is.
+    """
+    directory = _slot_directory(root, camera_id, image_id)
+    starts = _segment_starts(directory)
+    located: list[tuple[str, float, int, int]] = []
+    for position, segment_start in enumerate(starts):
+        # Segments are named after their first frame (in whole seconds), so the next one bounds this one.
+        if segment_start > end or (position + 1 < len(starts) and starts[position + 1] + 1 <= start):
+            continue
+        base = os.path.join(directory, str(segment_start))
+        records = _read_index(base + INDEX_SUFFIX)
+        timestamps = [record[0] for record in records]
+        for record in records[bisect_left(timestamps, start):bisect_right(timestamps, end)]:
+            located.append((base + SEGMENT_SUFFIX, *record))
+
+    if len(located) > max_frames > 0:
+        step = len(located) / max_frames
+        located = [located[int(position * step)] for position in range(max_frames)]
+
+    mapped_path: str | None = None
+    mapped: mmap.mmap | None = None
+    try:
+        for path, timestamp, offset, length in located:
+            if path != mapped_path:
+                if mapped is not None:
+                    mapped.close()
+                mapped_path, mapped = path, None
+                try:
+                    with open(path, 'rb') as file:
+                        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                except FileNotFoundError:
+                    # Pruned since the index was read.
+                    pass
+            if mapped is not None:
+                yield timestamp, mapped[offset:offset + length]
+    finally:
+        if mapped is not None:
+            mapped.close()
+
+
+def prune(root: str, cutoff: float, quota_bytes: int) -> int:
+    """Drop segments whose newest frame is older than cutoff, then the oldest ones until under quota.
+
+    Returns the bytes left on disk.
+    """
+    segments: list[tuple[int, str, int]] = []
+    try:
+        slots = os.listdir(root)
+    except FileNotFoundError:
+        return 0
+    for slot in slots:
+        directory = os.path.join(root, slot)
+        for segment_start in _segment_starts(directory):
+            base = os.path.join(directory, str(segment_start))
+            records = _read_index(base + INDEX_SUFFIX)
+            size = os.path.getsize(base + SEGMENT_SUFFIX) + len(records) * INDEX_RECORD.size
+            if not records or records[-1][0] < cutoff:
+                _remove_segment(base)
+            else:
+                segments.append((segment_start, base, size))
+
+    total = sum(size for _, _, size in segments)
+    for _, base, size in sorted(segments):
+        if total <= quota_bytes:
+            break
+        _remove_segment(base)
+        total -= size
+    return total
+
+
+def _remove_segment(base: str) -> None:
+    for suffix in (INDEX_SUFFIX, SEGMENT_SUFFIX):
+        try:
+            os.remove(base + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def mjpeg_part(content: bytes) -> bytes:
+    """One part of a multipart/x-mixed-replace MJPEG stream."""
+    return (
+        f'--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(content)}\r\n\r\n'.encode()
+        + content + b'\r\n'
+    )
+
+
+class FrameArchive:
+    """Keeps camera frames on disk after the upstream image list has rotated them out.
+
+    Each camera slot gets append-only segment files with a fixed-size index of timestamp, offset and length.
+    Frames are queued on the event loop and appended by a background task in the executor; when the queue is
+    full new frames are dropped and counted. Retention and the disk quota are enforced every few minutes.
+    """
+
+    def __init__(
+            self,
+            directory: str,
+            logger: Logger,
+            clock: ClockInterface | None = None,
+            retention: timedelta = DEFAULT_RETENTION,
+            quota_bytes: int = DEFAULT_QUOTA_BYTES,
+            max_pending_frames: int = DEFAULT_MAX_PENDING_FRAMES
+    ) -> None:
+        self.__directory: str = directory
+        self.__logger: Logger = logger
+        self.__clock: ClockInterface = clock or SystemClock()
+        self.__queue: asyncio.Queue[tuple[int, int, float, bytes] | None] = asyncio.Queue(max_pending_frames)
+        self.__task: asyncio.Task | None = None
+        self.__last_timestamps: dict[tuple[int, int], float] = {}
+        self.__next_prune: float = 0.0
+        self.retention: timedelta = retention
+        self.quota_bytes: int = quota_bytes
+        self.written_frames: int = 0
+        self.dropped_frames: int = 0
+        self.stored_bytes: int | None = None
+
+    @property
+    def directory(self) -> str:
+        return self.__directory
+
+    def start(self) -> None:
+        if self.__task is None:
+            self.__task = asyncio.get_running_loop().create_task(self.__run())
+
+    async def stop(self) -> None:
+        if self.__task is None:
+            return
+        await self.__queue.put(None)
+        await self.__task
+        self.__task = None
+
+    def add_frame(self, camera_id: int, image_id: int, added: datetime, content: bytes) -> None:
+        timestamp = added.timestamp()
+        # Frames of a slot only move forward; a repeated download of the same frame is not stored twice.
+        if timestamp <= self.__last_timestamps.get((camera_id, image_id), float('-inf')):
+            return
+        try:
+            self.__queue.put_nowait((camera_id, image_id, timestamp, content))
+        except asyncio.QueueFull:
+            self.dropped_frames += 1
+            self.__logger.warning(
+                f"Archive queue is full, dropped a frame of camera {camera_id} ({self.dropped_frames} so far)"
+            )
+            return
+        self.__last_timestamps[(camera_id, image_id)] = timestamp
+
+    async def frames(
+            self, camera_id: int, image_id: int, start: datetime, end: datetime, max_frames: int = 0
+    ) -> AsyncIterator[tuple[datetime, bytes]]:
+        """Frames of a slot in the period, each read in the executor just before it is yielded."""
+        loop = asyncio.get_running_loop()
+        frames = read_frames(self.__directory, camera_id, image_id, start.timestamp(), end.timestamp(), max_frames)
+        try:
+            while (frame := await loop.run_in_executor(None, next, frames, None)) is not None:
+                timestamp, content = frame
+                yield datetime.fromtimestamp(timestamp, timezone.utc), content
+        finally:
+            # Unmaps the current segment when the consumer stops early, e.g. a closed browser tab.
+            await loop.run_in_executor(None, frames.close)
+
+    async def timelapse(
+            self, camera_id: int, image_id: int, start: datetime, end: datetime, fps: float, max_frames: int
+    ) -> AsyncIterator[bytes]:
+        """MJPEG parts of the slot's frames in the period, paced at fps."""
+        async for _, content in self.frames(camera_id, image_id, start, end, max_frames):
+            yield mjpeg_part(content)
+            await asyncio.sleep(1 / fps)
+
+    def diagnostics(self) -> dict:
+        return {
+            'written_frames': self.written_frames,
+            'dropped_frames': self.dropped_frames,
+            'pending_frames': self.__queue.qsize(),
+            'stored_bytes': self.stored_bytes,
+            'retention_hours': self.retention.total_seconds() / 3600,
+            'quota_bytes': self.quota_bytes,
+        }
+
+    async def __run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while (item := await self.__queue.get()) is not None:
+            camera_id, image_id, timestamp, content = item
+            try:
+                if await loop.run_in_executor(
+                        None, append_frame, self.__directory, camera_id, image_id, timestamp, content
+                ):
+                    self.written_frames += 1
+                if time.monotonic() >= self.__next_prune:
+                    self.__next_prune = time.monotonic() + PRUNE_INTERVAL_SECONDS
+                    cutoff = (self.__clock.now() - self.retention).timestamp()
+                    self.stored_bytes = await loop.run_in_executor(
+                        None, prune, self.__directory, cutoff, self.quota_bytes
+                    )
+            except OSError as error:
+                self.__logger.error(f"Could not archive a frame of camera {camera_id}: {error}")
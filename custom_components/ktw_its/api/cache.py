@@ -0,0 +1,283 @@
+import asyncio
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from logging import Logger
+from types import FunctionType, MethodType, ModuleType
+from typing import Generic, TypeVar
+
+from custom_components.ktw_its.api.clock import ClockInterface, SystemClock
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+DEFAULT_MAX_STALENESS = timedelta(0)
+
+
+class CacheStats:
+    """Read outcomes of one cached source and how long its last upstream refresh took."""
+    __slots__ = ('hits', 'stale_hits', 'misses', 'refreshes', 'evictions', 'last_refresh_seconds')
+
+    def __init__(self) -> None:
+        self.hits: int = 0
+        self.stale_hits: int = 0
+        self.misses: int = 0
+        self.refreshes: int = 0
+        self.evictions: int = 0
+        self.last_refresh_seconds: float | None = None
+
+    def hit(self) -> None:
+        self.hits += 1
+
+    def stale_hit(self) -> None:
+        self.stale_hits += 1
+
+    def miss(self) -> None:
+        self.misses += 1
+
+    @contextmanager
+    def refreshing(self) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.refreshes += 1
+            self.last_refresh_seconds = time.monotonic() - started
+
+    def as_dict(self) -> dict[str, float | int | None]:
+        reads = self.hits + self.stale_hits + self.misses
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_ratio': round((self.hits + self.stale_hits) / reads, 3) if reads else None,
+            'refreshes': self.refreshes,
+            'evictions': self.evictions,
+            'last_refresh_ms': round(self.last_refresh_seconds * 1000, 3)
+            if self.last_refresh_seconds is not None else None,
+        }
+
+
+def estimate_size(obj: object) -> int:
+    """Rough deep size in bytes of an object graph; objects reachable more than once are counted once."""
+    seen: set[int] = set()
+    stack: list[object] = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, (type, ModuleType, FunctionType, MethodType)):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+
+        if isinstance(item, (str, bytes, bytearray, array, int, float, bool)) or item is None:
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        else:
+            if hasattr(item, '__dict__'):
+                stack.append(item.__dict__)
+            for cls in type(item).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    if slot.startswith('__') and not slot.endswith('__'):
+                        slot = f"_{cls.__name__.lstrip('_')}{slot}"
+                    if hasattr(item, slot):
+                        stack.append(getattr(item, slot))
+    return total
+
+
+class StaleWhileRevalidate:
+    """Lets expired data be served for up to max_staleness while one background refresh per key runs.
+
+    With the default max_staleness of zero every expired read waits for the upstream request, as before.
+    """
+
+    def __init__(self, logger: Logger, max_staleness: timedelta = DEFAULT_MAX_STALENESS) -> None:
+        self.__logger: Logger = logger
+        self.__tasks: dict[Hashable, asyncio.Task] = {}
+        self.max_staleness: timedelta = max_staleness
+
+    def can_serve_stale(self, valid_to: datetime | None, now: datetime) -> bool:
+        return valid_to is not None and now - valid_to <= self.max_staleness
+
+    def serve_stale(self, key: Hashable, refresh: Callable[[], Awaitable[object]]) -> None:
+        """Make sure a refresh for the key is running in the background."""
+        if key in self.__tasks:
+            return
+
+        self.__tasks[key] = asyncio.get_running_loop().create_task(self.__revalidate(key, refresh))
+
+    def is_revalidating(self, key: Hashable) -> bool:
+        return key in self.__tasks
+
+    async def close(self) -> None:
+        tasks = list(self.__tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def __revalidate(self, key: Hashable, refresh: Callable[[], Awaitable[object]]) -> None:
+        try:
+            await refresh()
+        except Exception as error:  # pylint: disable=broad-except
+            # The stale value stays in place; once it is too old the next read refreshes in the foreground.
+            self.__logger.warning(f"Background refresh of {key} failed: {error}")
+        finally:
+            self.__tasks.pop(key, None)
+
+
+class CacheEntry(Generic[V]):
+    __slots__ = ('value', 'valid_to')
+
+    def __init__(self, value: V, valid_to: datetime) -> None:
+        self.value: V = value
+        self.valid_to: datetime = valid_to
+
+
+class TtlCache(Generic[K, V]):
+    """Async read-through cache whose entries expire when the loaded payload says so.
+
+    The loader returns the value together with its expiry, so validity follows upstream timestamps rather
+    than a fixed TTL. Concurrent misses for one key share a single load, expired entries are served stale
+    within the revalidator's limit, and with max_entries set the least recently read entries are evicted.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            loader: Callable[[K], Awaitable[tuple[V, datetime]]],
+            logger: Logger,
+            clock: ClockInterface | None = None,
+            revalidator: StaleWhileRevalidate | None = None,
+            max_entries: int | None = None,
+            min_ttl: timedelta = timedelta(0),
+            on_remove: Callable[[K], None] | None = None
+    ) -> None:
+        self.__name: str = name
+        self.__loader: Callable[[K], Awaitable[tuple[V, datetime]]] = loader
+        self.__logger: Logger = logger
+        self.__clock: ClockInterface = clock or SystemClock()
+        self.__revalidator: StaleWhileRevalidate = revalidator or StaleWhileRevalidate(logger=logger)
+        self.__max_entries: int | None = max_entries
+        self.__min_ttl: timedelta = min_ttl
+        self.__on_remove: Callable[[K], None] | None = on_remove
+        self.__entries: OrderedDict[K, CacheEntry[V]] = OrderedDict()
+        self.__loads: dict[K, asyncio.Task] = {}
+        # Exempt from LRU eviction, and served stale for up to their own limit while they are refreshed.
+        self.__pinned: set[K] = set()
+        self.__pinned_max_staleness: timedelta = timedelta(0)
+        self.stats: CacheStats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.__entries
+
+    def keys(self) -> list[K]:
+        return list(self.__entries)
+
+    async def get(self, key: K) -> V:
+        entry = self.__entries.get(key)
+        now = self.__clock.now()
+        if entry is not None and entry.valid_to >= now:
+            self.__logger.debug(f"Cached {self.__name} {key} is still valid")
+            self.stats.hit()
+            self.__entries.move_to_end(key)
+            return entry.value
+
+        if entry is not None and (
+                self.__revalidator.can_serve_stale(entry.valid_to, now)
+                or (key in self.__pinned and now - entry.valid_to <= self.__pinned_max_staleness)
+        ):
+            self.__logger.debug(f"Cached {self.__name} {key} is stale, refreshing in the background")
+            self.stats.stale_hit()
+            self.__entries.move_to_end(key)
+            self.__revalidator.serve_stale((self.__name, key), lambda: self.refresh(key))
+            return entry.value
+
+        self.stats.miss()
+        return await self.refresh(key)
+
+    async def refresh(self, key: K) -> V:
+        task = self.__loads.get(key)
+        # A finished load stays registered until its done callback runs; it must not be joined again.
+        if task is None or task.done():
+            task = self.__loads[key] = asyncio.get_running_loop().create_task(self.__load(key))
+            task.add_done_callback(lambda done: self.__forget_load(key, done))
+        # A cancelled caller must not cancel the load other callers are waiting for.
+        return await asyncio.shield(task)
+
+    def peek(self, key: K) -> V | None:
+        """The cached value, expired or not, without touching statistics or recency."""
+        entry = self.__entries.get(key)
+        return entry.value if entry is not None else None
+
+    def valid_to(self, key: K) -> datetime | None:
+        entry = self.__entries.get(key)
+        return entry.valid_to if entry is not None else None
+
+    def put(self, key: K, value: V, valid_to: datetime) -> None:
+        self.__entries[key] = CacheEntry(value, max(valid_to, self.__clock.now() + self.__min_ttl))
+        self.__entries.move_to_end(key)
+        while self.__max_entries is not None and len(self.__entries) > self.__max_entries:
+            evicted = next((candidate for candidate in self.__entries if candidate not in self.__pinned), None)
+            if evicted is None:
+                break
+            del self.__entries[evicted]
+            self.stats.evictions += 1
+            self.__logger.debug(f"Evicted cached {self.__name} {evicted}")
+            if self.__on_remove is not None:
+                self.__on_remove(evicted)
+
+    def pin(self, keys: set[K], max_staleness: timedelta = timedelta(0)) -> None:
+        """Keep these keys cached however long ago they were read; replaces the previous pins.
+
+        Expired pinned entries are served for up to max_staleness while a background refresh runs, even when
+        the revalidator would not allow it.
+        """
+        self.__pinned = set(keys)
+        self.__pinned_max_staleness = max_staleness
+
+    def invalidate(self, key: K | None = None) -> None:
+        """Drop one entry, or every entry when no key is given.
+
+        Loads of the dropped keys already in flight keep running for their current callers, but do not store
+        their result; later reads start a new one.
+        """
+        if key is None:
+            self.__loads.clear()
+        else:
+            self.__loads.pop(key, None)
+        keys = [key] if key is not None else list(self.__entries)
+        for removed in keys:
+            if self.__entries.pop(removed, None) is not None and self.__on_remove is not None:
+                self.__on_remove(removed)
+
+    def as_dict(self) -> dict:
+        return {
+            **self.stats.as_dict(),
+            'entries': len(self.__entries),
+            'max_entries': self.__max_entries,
+            'estimated_bytes': estimate_size([entry.value for entry in self.__entries.values()]),
+        }
+
+    def __forget_load(self, key: K, task: asyncio.Task) -> None:
+        # The key may already belong to a load started after an invalidate().
+        if self.__loads.get(key) is task:
+            del self.__loads[key]
+
+    async def __load(self, key: K) -> V:
+        with self.stats.refreshing():
+            value, valid_to = await self.__loader(key)
+        # invalidate() unregisters the key's load, so only a load that is still the current one stores its result.
+        if self.__loads.get(key) is asyncio.current_task():
+            self.put(key, value, valid_to)
+        return value
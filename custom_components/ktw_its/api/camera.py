@@ -1,11 +1,19 @@
+import asyncio
+import json
 from dataclasses import dataclass
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timedelta
 from typing import List, TypedDict
 from marshmallow import Schema, fields, post_load, INCLUDE
 from typing import Iterable
 
 from homeassistant.helpers.device_registry import DeviceInfo, DeviceEntryType
-from custom_components.ktw_its.api.http_client import HttpClientInterface
+from custom_components.ktw_its.api.archive import FrameArchive
+from custom_components.ktw_its.api.cache import StaleWhileRevalidate, TtlCache, estimate_size
+from custom_components.ktw_its.api.clock import ClockInterface, SystemClock
+from custom_components.ktw_its.api.http_client import HttpClientInterface, ResponseSizeError
+from custom_components.ktw_its.api.offload import run_cpu_bound
+from custom_components.ktw_its.api.scheduler import Priority, prioritized
+from custom_components.ktw_its.api.watchdog import BlockingWatchdog
 from logging import Logger
 
 from custom_components.ktw_its.image import KtwItsImageEntityDescription
@@ -14,7 +22,7 @@ from custom_components.ktw_its.const import DEFAULT_NAME, DOMAIN
 from custom_components.ktw_its.dto import KtwItsCameraImageDto
 
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class Properties:
     id: int
     name: str
@@ -37,7 +45,7 @@ class PropertiesSchema(Schema):
         return Properties(**data)
 
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class Geometry:
     type: str
     coordinates: list[float]
@@ -52,7 +60,7 @@ class GeometrySchema(Schema):
         return Geometry(**data)
 
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class Feature:
     type: str
     properties: Properties
@@ -69,15 +77,21 @@ class FeatureSchema(Schema):
         return Feature(**data)
 
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class FeatureCollection:
     type: str
     features: list[Feature]
 
     @classmethod
-    def from_json(cls, json_data: str) -> "FeatureCollection":
-        future_collection: FeatureCollection = FeatureCollectionSchema().loads(json_data=json_data)
-        return future_collection
+    def from_json(cls, json_data: str, camera_ids: set[int] | None = None) -> "FeatureCollection":
+        if camera_ids is None:
+            future_collection: FeatureCollection = FeatureCollectionSchema().loads(json_data=json_data)
+            return future_collection
+
+        # Drop unselected cameras before the schema builds objects for them.
+        data = json.loads(json_data)
+        data['features'] = [feature for feature in data['features'] if feature['properties']['id'] in camera_ids]
+        return FeatureCollectionSchema().load(data)
 
 
 class FeatureCollectionSchema(Schema):
@@ -89,7 +103,7 @@ class FeatureCollectionSchema(Schema):
         return FeatureCollection(**data)
 
 
-@dataclass
+@dataclass(slots=True)
 class Image:
     filename: str
     addTime: datetime
@@ -112,7 +126,7 @@ class ImageSchema(Schema):
         return Image(**data)
 
 
-@dataclass
+@dataclass(slots=True)
 class Images:
     images: list[Image]
 
@@ -133,32 +147,163 @@ class ImagesSchema(Schema):
         return Images(**data)
 
 
+@dataclass(frozen=True, slots=True)
+class CameraFrame:
+    digest: str
+    content: bytes
+
+
+CAMERAS_KEY = 'cameras'
+MAX_CAMERAS_WITH_IMAGES = 64
+# Image lists whose newest frame is already old are still kept this long, so repeated views do not refetch them.
+IMAGES_MIN_TTL = timedelta(seconds=30)
+# Expired image lists of pinned cameras are served this long, so views between the rotation and the pre-warm
+# that picks up the new list do not wait on upstream.
+PINNED_IMAGES_MAX_STALENESS = timedelta(minutes=5)
+# Hard cap for a single camera frame, whatever the image list claims.
+MAX_IMAGE_BYTES = 2 * 1024 * 1024
+
+
+def list_cameras(json_data: str) -> dict[int, str]:
+    return {
+        feature['properties']['id']: f"{feature['properties']['name']} [{feature['properties']['description']}]"
+        for feature in json.loads(json_data)['features']
+        if feature['properties']['state'] == 1
+    }
+
+
 class CameraApi:
-    def __init__(self, http_client: HttpClientInterface, logger: Logger) -> None:
+    def __init__(
+            self,
+            http_client: HttpClientInterface,
+            logger: Logger,
+            clock: ClockInterface | None = None,
+            watchdog: BlockingWatchdog | None = None,
+            revalidator: StaleWhileRevalidate | None = None,
+            max_cameras_with_images: int = MAX_CAMERAS_WITH_IMAGES
+    ) -> None:
         self.__http_client: HttpClientInterface = http_client
         self.__logger: Logger = logger
-        self.__cameras_data: dict[str, KtwItsCameraImageDto] = {}
-        self.__cameras_data_valid_to: datetime | None = None
-        self.__camera_images_data: dict[int, list[Image]] = {}
-        self.__camera_images_data_valid_to: dict[int, datetime] = {}
+        self.__clock: ClockInterface = clock or SystemClock()
+        self.__watchdog: BlockingWatchdog = watchdog or BlockingWatchdog(logger=logger)
+        self.__revalidator: StaleWhileRevalidate = revalidator or StaleWhileRevalidate(logger=logger)
+        self.__cameras_cache: TtlCache[str, dict[str, KtwItsCameraImageDto]] = TtlCache(
+            name='cameras',
+            loader=self.__load_cameras_data,
+            logger=logger,
+            clock=self.__clock,
+            revalidator=self.__revalidator
+        )
+        # Image lists are only loaded for cameras someone looks at; the least recently viewed are evicted.
+        self.__images_cache: TtlCache[int, list[Image]] = TtlCache(
+            name='camera images',
+            loader=self.__load_camera_images,
+            logger=logger,
+            clock=self.__clock,
+            revalidator=self.__revalidator,
+            max_entries=max_cameras_with_images,
+            min_ttl=IMAGES_MIN_TTL,
+            on_remove=self.__forget_camera_images
+        )
+        self.__camera_slots: dict[int, dict[int, KtwItsCameraImageDto]] = {}
+        self.__slot_digests: dict[tuple[int, int], str] = {}
+        self.__frames: dict[tuple[int, int], CameraFrame] = {}
+        self.__selected_camera_ids: set[int] | None = None
+        self.__archived_camera_ids: set[int] = set()
+        self.archive: FrameArchive | None = None
 
     async def fetch_data(self) -> dict[str, KtwItsCameraImageDto]:
-        if self.__cameras_data_valid_to is not None and self.__cameras_data_valid_to >= datetime.now(timezone.utc):
-            self.__logger.debug("Cameras data is still valid")
+        cameras_data = await self.__cameras_cache.get(CAMERAS_KEY)
 
-            for cameras_data in self.__cameras_data.values():
-                if (cameras_data is not None
-                        and cameras_data.image_last_updated is not None
-                        and cameras_data.image_last_updated < datetime.now(timezone.utc) - timedelta(minutes=5)):
-                    cameras_data.image_last_updated = None
+        for camera_data in cameras_data.values():
+            if (camera_data is not None
+                    and camera_data.image_last_updated is not None
+                    and camera_data.image_last_updated < self.__clock.now() - timedelta(minutes=5)):
+                camera_data.image_last_updated = None
+                # Forget the slot digest so the next image list publishes the current frame again.
+                self.__slot_digests.pop(
+                    (camera_data.entity_description.camera_id, camera_data.entity_description.image_id), None
+                )
 
-            return self.__cameras_data
+        return cameras_data
 
+    async def fetch_cameras(self) -> dict[int, str]:
         camera_json = await self.__http_client.make_request('https://its.katowice.eu/api/cameras')
-        feature_collection = FeatureCollection.from_json(camera_json)
+        return await run_cpu_bound(len(camera_json), list_cameras, camera_json)
+
+    def diagnostics(self) -> dict:
+        valid_to = self.__cameras_cache.valid_to(CAMERAS_KEY)
+        return {
+            'cameras': {
+                **self.__cameras_cache.as_dict(),
+                'valid_to': valid_to.isoformat() if valid_to else None,
+            },
+            'camera_images': self.__images_cache.as_dict(),
+            'camera_frames': {
+                'entries': len(self.__frames),
+                'estimated_bytes': estimate_size(self.__frames),
+            },
+        }
+
+    def camera_slot(self, camera_id: int, image_id: int) -> KtwItsCameraImageDto | None:
+        """The slot as of the latest camera list, which may be newer than what the coordinator holds."""
+        return self.__camera_slots.get(camera_id, {}).get(image_id)
+
+    def camera_slots_state(self, camera_id: int) -> tuple:
+        """Timestamp and frame digest of every slot of a camera, for change detection."""
+        return tuple(
+            (image_id, dto.image_last_updated, self.__slot_digests.get((camera_id, image_id)))
+            for image_id, dto in sorted(self.__camera_slots.get(camera_id, {}).items())
+        )
 
-        self.__cameras_data_valid_to = datetime.now(timezone.utc) + timedelta(minutes=60)
+    def pin_cameras(self, camera_ids: set[int]) -> None:
+        """Exempt the image lists of these cameras from LRU eviction, e.g. the pre-warmed favorites."""
+        self.__images_cache.pin(camera_ids, max_staleness=PINNED_IMAGES_MAX_STALENESS)
+
+    @property
+    def camera_ids(self) -> set[int]:
+        """Cameras of the latest camera list."""
+        return set(self.__camera_slots)
+
+    def set_archived_cameras(self, camera_ids: set[int]) -> None:
+        """Cameras whose frames go to the archive when they are pre-warmed."""
+        self.__archived_camera_ids = set(camera_ids)
+
+    def set_selection(self, camera_ids: set[int] | None) -> None:
+        if camera_ids == self.__selected_camera_ids:
+            return
+
+        self.__selected_camera_ids = camera_ids
+        self.__cameras_cache.invalidate()
+        self.__camera_slots = {}
+        if camera_ids is not None:
+            for camera_id in self.__images_cache.keys():
+                if camera_id not in camera_ids:
+                    self.__images_cache.invalidate(camera_id)
+
+    async def __load_cameras_data(self, key: str) -> tuple[dict[str, KtwItsCameraImageDto], datetime]:
+        previous_cameras_data = self.__cameras_cache.peek(key) or {}
+        # The hourly refetch of an already known camera list can wait behind everything else.
+        with prioritized(Priority.BACKGROUND if previous_cameras_data else Priority.CRITICAL):
+            camera_json = await self.__http_client.make_request('https://its.katowice.eu/api/cameras')
+        parse = self.__watchdog.section('camera.parse')
+        feature_collection = await run_cpu_bound(
+            len(camera_json), FeatureCollection.from_json, camera_json, self.__selected_camera_ids, timer=parse
+        )
+
+        with self.__watchdog.section('camera.build') as build:
+            cameras_data = self.__build_cameras_data(feature_collection, previous_cameras_data)
+        self.__logger.debug(f"Cameras refresh blocked the event loop for {parse.elapsed_ms + build.elapsed_ms:.1f} ms")
+
+        return cameras_data, self.__clock.now() + timedelta(minutes=60)
 
+    def __build_cameras_data(
+            self,
+            feature_collection: FeatureCollection,
+            previous_cameras_data: dict[str, KtwItsCameraImageDto]
+    ) -> dict[str, KtwItsCameraImageDto]:
+        cameras_data: dict[str, KtwItsCameraImageDto] = {}
+        camera_slots: dict[int, dict[int, KtwItsCameraImageDto]] = {}
         for feature in feature_collection.features:
 
             state_attributes = {
@@ -186,57 +331,106 @@ class CameraApi:
                 while i < count:
                     key = DOMAIN + '_' + feature.properties.name + '_' + str(i) + '_' + '_image'
 
-                    self.__cameras_data.update([(
-                        key,
-                        KtwItsCameraImageDto(
-                            state_attributes=state_attributes,
-                            entity_description=KtwItsImageEntityDescription(
-                                key=key,
-                                group='camera',
-                                camera_id=feature.properties.id,
-                                camera_name=feature.properties.name,
-                                camera_description=feature.properties.description,
-                                image_id=i,
-                                device_info=device_info
-                            )
+                    camera_image_dto = KtwItsCameraImageDto(
+                        state_attributes=state_attributes,
+                        entity_description=KtwItsImageEntityDescription(
+                            key=key,
+                            group='camera',
+                            camera_id=feature.properties.id,
+                            camera_name=feature.properties.name,
+                            camera_description=feature.properties.description,
+                            image_id=i,
+                            device_info=device_info
                         )
-                    )])
+                    )
+                    previous_dto = previous_cameras_data.get(key)
+                    if previous_dto is not None:
+                        camera_image_dto.image_last_updated = previous_dto.image_last_updated
+                    cameras_data[key] = camera_image_dto
+                    camera_slots.setdefault(feature.properties.id, {})[i] = camera_image_dto
                     i += 1
 
-        return self.__cameras_data
+        self.__camera_slots = camera_slots
+        # Cameras that went offline or disappeared upstream take their image lists and frames with them.
+        for camera_id in self.__images_cache.keys():
+            if camera_id not in camera_slots:
+                self.__images_cache.invalidate(camera_id)
+
+        return cameras_data
 
     async def get_camera_image(self, camera_id: int, image_id: int) -> bytes | None:
-        images = await self.__get_camera_images(camera_id)
-        if images.__len__() == 0:
+        images = await self.__images_cache.get(camera_id)
+        if image_id >= len(images):
             self.__logger.error("Camera " + str(camera_id) + " has no image with id " + str(image_id))
             return None
 
-        filename = images[image_id].filename
-
-        return await self.__http_client.make_request_bytes(
-            'https://its.katowice.eu/api/camera/image/{0}/{1}'.format(str(camera_id), filename)
-        )
-
-    async def __get_camera_images(self, camera_id: int) -> list[Image]:
-        if bool(self.__camera_images_data_valid_to.get(camera_id)) and self.__camera_images_data_valid_to[camera_id] >= datetime.now(timezone.utc):
-            self.__logger.debug("Camera " + str(camera_id) + " data is still valid")
-            return self.__camera_images_data[camera_id]
-
+        image = images[image_id]
+        frame = self.__frames.get((camera_id, image_id))
+        if frame is not None and frame.digest == image.digest:
+            self.__logger.debug("Camera " + str(camera_id) + " image " + str(image_id) + " is unchanged")
+            return frame.content
+
+        try:
+            content = await self.__http_client.download(
+                'https://its.katowice.eu/api/camera/image/{0}/{1}'.format(str(camera_id), image.filename),
+                max_bytes=MAX_IMAGE_BYTES,
+                expected_size=image.size or None
+            )
+        except (ResponseSizeError, asyncio.TimeoutError) as error:
+            self.__logger.warning(
+                "Camera " + str(camera_id) + " image " + str(image_id) + " download failed: " + (str(error) or 'timeout')
+            )
+            # An older frame beats an empty card.
+            return frame.content if frame is not None else None
+
+        if camera_id in self.__images_cache:
+            self.__frames[(camera_id, image_id)] = CameraFrame(digest=image.digest, content=content)
+
+        return content
+
+    async def prewarm(self, camera_id: int) -> datetime | None:
+        """Load the current frames of a camera into memory and return when its image list expires.
+
+        Frames of archived cameras are archived here, on the pre-warm schedule, so the archive has no gaps
+        while nobody looks at the camera.
+        """
+        valid_to = self.__images_cache.valid_to(camera_id)
+        if valid_to is not None and valid_to >= self.__clock.now():
+            images = await self.__images_cache.get(camera_id)
+        else:
+            # Views keep getting the pinned stale list meanwhile; the pre-warm itself waits for the new one.
+            images = await self.__images_cache.refresh(camera_id)
+        for image_id, image in enumerate(images):
+            content = await self.get_camera_image(camera_id, image_id)
+            if content is not None and self.archive is not None and camera_id in self.__archived_camera_ids:
+                self.archive.add_frame(camera_id, image_id, image.addTime, content)
+
+        return self.__images_cache.valid_to(camera_id)
+
+    async def __load_camera_images(self, camera_id: int) -> tuple[list[Image], datetime]:
         images_json = await self.__http_client.make_request(
             'https://its.katowice.eu/api/cameras/{0}/images'.format(str(camera_id))
         )
-        images = Images.from_json(images_json)
+        images = await run_cpu_bound(
+            len(images_json), Images.from_json, images_json, timer=self.__watchdog.section('camera.images_parse')
+        )
         if images.is_empty():
             self.__logger.error("Camera " + str(camera_id) + " has no images")
-            return []
+            return [], self.__clock.now()
 
-        image_last_updated = images.images[0].addTime
+        slots = self.__camera_slots.get(camera_id, {})
+        for image_id, image in enumerate(images.images):
+            if self.__slot_digests.get((camera_id, image_id)) == image.digest:
+                continue
 
-        self.__camera_images_data_valid_to[camera_id] = image_last_updated + timedelta(minutes=5)
-        self.__camera_images_data[camera_id] = images.images
+            self.__slot_digests[(camera_id, image_id)] = image.digest
+            if image_id in slots:
+                slots[image_id].image_last_updated = image.addTime
 
-        for cameras_data in self.__cameras_data.values():
-            if cameras_data is not None and cameras_data.entity_description.camera_id == camera_id:
-                cameras_data.image_last_updated = image_last_updated
+        return images.images, images.images[0].addTime + timedelta(minutes=5)
 
-        return self.__camera_images_data[camera_id]
+    def __forget_camera_images(self, camera_id: int) -> None:
+        for key in [key for key in self.__frames if key[0] == camera_id]:
+            del self.__frames[key]
+        for key in [key for key in self.__slot_digests if key[0] == camera_id]:
+            del self.__slot_digests[key]
@@ -0,0 +1,34 @@
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone, timedelta
+
+
+class ClockInterface(ABC):
+    @abstractmethod
+    def now(self) -> datetime:
+        pass
+
+
+class SystemClock(ClockInterface):
+    def now(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+
+class SimulatedClock(ClockInterface):
+    """Clock starting at a given instant and running `speed` times faster than wall time.
+
+    With speed=0 time only moves through advance(), which makes runs fully deterministic.
+    """
+
+    def __init__(self, start: datetime, speed: float = 1.0) -> None:
+        self.__start: datetime = start
+        self.__speed: float = speed
+        self.__offset: timedelta = timedelta()
+        self.__started_monotonic: float = time.monotonic()
+
+    def now(self) -> datetime:
+        elapsed = (time.monotonic() - self.__started_monotonic) * self.__speed
+        return self.__start + self.__offset + timedelta(seconds=elapsed)
+
+    def advance(self, delta: timedelta) -> None:
+        self.__offset += delta
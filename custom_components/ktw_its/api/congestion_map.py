@@ -0,0 +1,167 @@
+import asyncio
+import math
+import struct
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from logging import Logger
+
+from custom_components.ktw_its.api.clock import ClockInterface, SystemClock
+
+MAP_SIZE = 1024
+MARGIN = 24
+LINE_RADIUS = 2
+BACKGROUND = (245, 245, 240)
+# Segments without a reading, or with a color that cannot be parsed.
+NO_DATA = (150, 150, 150)
+NAMED_COLORS: dict[str, tuple[int, int, int]] = {
+    'green': (0, 160, 60),
+    'yellow': (240, 200, 0),
+    'orange': (245, 130, 0),
+    'red': (220, 30, 30),
+    'darkred': (140, 0, 0),
+    'black': (30, 30, 30),
+}
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class MapSegment:
+    code: int
+    color: str | None
+    avg_speed: int | None
+    # Polylines of (longitude, latitude) points.
+    lines: tuple[tuple[tuple[float, float], ...], ...]
+
+
+def parse_color(color: str | None) -> tuple[int, int, int]:
+    if not color:
+        return NO_DATA
+    color = color.strip().lower()
+    if color in NAMED_COLORS:
+        return NAMED_COLORS[color]
+    digits = color.lstrip('#')
+    if len(digits) == 3:
+        digits = ''.join(digit * 2 for digit in digits)
+    try:
+        value = int(digits, 16) if len(digits) == 6 else None
+    except ValueError:
+        value = None
+    if value is None:
+        return NO_DATA
+    return value >> 16, (value >> 8) & 0xFF, value & 0xFF
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def encode_png(pixels: bytearray, width: int, height: int) -> bytes:
+    """8-bit RGB PNG without row filters, which compresses well enough for flat map colors."""
+    stride = width * 3
+    raw = b''.join(b'\x00' + pixels[row * stride:(row + 1) * stride] for row in range(height))
+    return (
+        PNG_SIGNATURE
+        + _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        + _png_chunk(b'IDAT', zlib.compress(raw, 6))
+        + _png_chunk(b'IEND', b'')
+    )
+
+
+def render_png(segments: list[MapSegment], size: int = MAP_SIZE) -> bytes:
+    """Draw the segment polylines in their congestion colors; runs in the executor."""
+    points = [point for segment in segments for line in segment.lines for point in line]
+    if not points:
+        return encode_png(bytearray(bytes(BACKGROUND)), 1, 1)
+
+    min_lon = min(lon for lon, _ in points)
+    max_lon = max(lon for lon, _ in points)
+    min_lat = min(lat for _, lat in points)
+    max_lat = max(lat for _, lat in points)
+    # Equirectangular projection, with longitude shrunk to keep the city's proportions.
+    x_scale = math.cos(math.radians((min_lat + max_lat) / 2))
+    span_x = max((max_lon - min_lon) * x_scale, 1e-9)
+    span_y = max(max_lat - min_lat, 1e-9)
+    scale = (size - 2 * MARGIN) / max(span_x, span_y)
+    width = round(span_x * scale) + 2 * MARGIN
+    height = round(span_y * scale) + 2 * MARGIN
+
+    pixels = bytearray(bytes(BACKGROUND) * (width * height))
+    # Fastest first, so congested segments end up on top where they overlap.
+    for segment in sorted(segments, key=lambda item: -(item.avg_speed if item.avg_speed is not None else math.inf)):
+        color = bytes(parse_color(segment.color))
+        for line in segment.lines:
+            projected = [
+                (round(MARGIN + (lon - min_lon) * x_scale * scale), round(MARGIN + (max_lat - lat) * scale))
+                for lon, lat in line
+            ]
+            for start, end in zip(projected, projected[1:]):
+                _draw_line(pixels, width, height, start, end, color)
+
+    return encode_png(pixels, width, height)
+
+
+def _draw_line(
+        pixels: bytearray, width: int, height: int, start: tuple[int, int], end: tuple[int, int], color: bytes
+) -> None:
+    (x0, y0), (x1, y1) = start, end
+    dx, dy = abs(x1 - x0), -abs(y1 - y0)
+    step_x, step_y = (1 if x0 < x1 else -1), (1 if y0 < y1 else -1)
+    error = dx + dy
+    while True:
+        for y in range(max(y0 - LINE_RADIUS, 0), min(y0 + LINE_RADIUS + 1, height)):
+            row = y * width
+            left, right = max(x0 - LINE_RADIUS, 0), min(x0 + LINE_RADIUS + 1, width)
+            pixels[(row + left) * 3:(row + right) * 3] = color * (right - left)
+        if x0 == x1 and y0 == y1:
+            return
+        doubled = 2 * error
+        if doubled >= dy:
+            error += dy
+            x0 += step_x
+        if doubled <= dx:
+            error += dx
+            y0 += step_y
+
+
+class CongestionMap:
+    """Overview PNG of the traffic segments, re-rendered only when a segment's color or speed changes."""
+
+    def __init__(self, logger: Logger, clock: ClockInterface | None = None) -> None:
+        self.__logger: Logger = logger
+        self.__clock: ClockInterface = clock or SystemClock()
+        self.__signature: tuple | None = None
+        self.png: bytes | None = None
+        self.rendered_at: datetime | None = None
+        self.renders: int = 0
+        self.failures: int = 0
+
+    async def update(self, segments: list[MapSegment]) -> bool:
+        """Render the map if it differs from the cached one; returns whether it did."""
+        # Segment geometry does not change upstream, so colors and speeds fully describe the picture.
+        signature = tuple(sorted((segment.code, segment.color, segment.avg_speed) for segment in segments))
+        if signature == self.__signature:
+            return False
+
+        try:
+            png = await asyncio.get_running_loop().run_in_executor(None, render_png, segments)
+        except Exception:  # pylint: disable=broad-except
+            # The previous map stays up and the next refresh tries again; traffic sensors must not fail over it.
+            self.failures += 1
+            self.__logger.exception(f"Could not render the congestion map of {len(segments)} segments")
+            return False
+
+        self.png = png
+        self.__signature = signature
+        self.rendered_at = self.__clock.now()
+        self.renders += 1
+        self.__logger.debug(f"Congestion map re-rendered for {len(segments)} segments, {len(self.png)} bytes")
+        return True
+
+    def diagnostics(self) -> dict:
+        return {
+            'renders': self.renders,
+            'failures': self.failures,
+            'rendered_at': self.rendered_at.isoformat() if self.rendered_at else None,
+            'png_bytes': len(self.png) if self.png is not None else None,
+        }
@@ -0,0 +1,179 @@
+import asyncio
+import math
+import os
+import struct
+from array import array
+from datetime import datetime, timezone
+from logging import Logger
+from typing import Any
+
+MAGIC = b'KTWC'
+# Batch header: magic, column count, row count.
+HEADER = struct.Struct('<4sHI')
+
+# Column name and array typecode, in on-disk order. Missing measurements are stored as NaN.
+TRAFFIC_COLUMNS: tuple[tuple[str, str], ...] = (
+    ('segment_code', 'i'),
+    ('timestamp', 'd'),
+    ('avg_speed', 'f'),
+    ('avg_time', 'f'),
+    ('traffic', 'f'),
+    ('traffic_period', 'f'),
+    ('flow_per_hour', 'f'),
+)
+WEATHER_COLUMNS: tuple[tuple[str, str], ...] = (
+    ('timestamp', 'd'),
+    ('temperature', 'f'),
+    ('humidity', 'f'),
+    ('pressure', 'f'),
+    ('wind_speed', 'f'),
+    ('co', 'f'),
+    ('no', 'f'),
+    ('no2', 'f'),
+    ('o3', 'f'),
+    ('so2', 'f'),
+    ('pm2_5', 'f'),
+    ('pm10', 'f'),
+    ('nh3', 'f'),
+    ('aqi', 'f'),
+)
+SCHEMAS: dict[str, tuple[tuple[str, str], ...]] = {'traffic': TRAFFIC_COLUMNS, 'weather': WEATHER_COLUMNS}
+
+DEFAULT_MAX_PENDING_BATCHES = 64
+
+
+def _number(value: float | int | None) -> float:
+    return math.nan if value is None else float(value)
+
+
+def _day(date_time: datetime) -> str:
+    return date_time.astimezone(timezone.utc).date().isoformat()
+
+
+def _empty_columns(schema: tuple[tuple[str, str], ...]) -> dict[str, array]:
+    return {name: array(typecode) for name, typecode in schema}
+
+
+def _file_name(kind: str, day: str) -> str:
+    return f'{kind}-{day}.ktwc'
+
+
+def write_batch(directory: str, kind: str, day: str, columns: dict[str, array]) -> None:
+    """Append one columnar batch to the day's file; runs in the executor."""
+    schema = SCHEMAS[kind]
+    rows = len(columns[schema[0][0]])
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, _file_name(kind, day)), 'ab') as file:
+        file.write(HEADER.pack(MAGIC, len(schema), rows))
+        for name, _ in schema:
+            file.write(columns[name].tobytes())
+
+
+def read_day(path: str) -> dict[str, array]:
+    """Read a whole day file back into one array per column, for offline analysis."""
+    kind = os.path.basename(path).split('-', 1)[0]
+    schema = SCHEMAS[kind]
+    columns = _empty_columns(schema)
+    with open(path, 'rb') as file:
+        while header := file.read(HEADER.size):
+            magic, column_count, rows = HEADER.unpack(header)
+            if magic != MAGIC or column_count != len(schema):
+                raise ValueError(f'Corrupt batch header in {path}')
+            for name, typecode in schema:
+                columns[name].frombytes(file.read(rows * array(typecode).itemsize))
+    return columns
+
+
+class SnapshotExporter:
+    """Streams traffic and weather refreshes into append-only columnar files, one per kind and day.
+
+    Batches are queued on the event loop and written by a background task in the executor. When the
+    queue is full new batches are dropped and counted instead of blocking the refresh.
+    """
+
+    def __init__(self, directory: str, logger: Logger, max_pending_batches: int = DEFAULT_MAX_PENDING_BATCHES) -> None:
+        self.__directory: str = directory
+        self.__logger: Logger = logger
+        self.__queue: asyncio.Queue[tuple[str, str, dict[str, array]] | None] = asyncio.Queue(max_pending_batches)
+        self.__task: asyncio.Task | None = None
+        self.__last_weather_timestamp: float | None = None
+        self.__last_traffic_timestamps: dict[int, float] = {}
+        self.written_batches: int = 0
+        self.dropped_batches: int = 0
+
+    @property
+    def directory(self) -> str:
+        return self.__directory
+
+    @property
+    def pending_batches(self) -> int:
+        return self.__queue.qsize()
+
+    def start(self) -> None:
+        if self.__task is None:
+            self.__task = asyncio.get_running_loop().create_task(self.__run())
+
+    async def stop(self) -> None:
+        if self.__task is None:
+            return
+        await self.__queue.put(None)
+        await self.__task
+        self.__task = None
+
+    def add_traffic(self, features: list[Any]) -> None:
+        # Readings around midnight belong to different days' files; each day gets its own batch.
+        batches: dict[str, tuple[dict[str, array], dict[int, float]]] = {}
+        for feature in features:
+            data = feature.properties.data
+            if data.date_time is None:
+                continue
+            # Upstream repeats a segment's reading until the next one, which is already in the export.
+            code = int(feature.properties.code)
+            timestamp = float(data.date_time.timestamp())
+            if timestamp <= self.__last_traffic_timestamps.get(code, float('-inf')):
+                continue
+            columns, exported = batches.setdefault(_day(data.date_time), (_empty_columns(TRAFFIC_COLUMNS), {}))
+            exported[code] = timestamp
+            columns['segment_code'].append(code)
+            columns['timestamp'].append(timestamp)
+            columns['avg_speed'].append(_number(data.avg_speed))
+            columns['avg_time'].append(_number(data.avg_time))
+            columns['traffic'].append(_number(data.traffic))
+            columns['traffic_period'].append(_number(data.traffic_period))
+            columns['flow_per_hour'].append(
+                60 / data.traffic_period * data.traffic if data.traffic_period and data.traffic is not None else math.nan
+            )
+        for day, (columns, exported) in sorted(batches.items()):
+            if self.__offer('traffic', day, columns):
+                self.__last_traffic_timestamps.update(exported)
+
+    def add_weather(self, weather: Any) -> None:
+        timestamp = float(weather.date.timestamp())
+        if timestamp == self.__last_weather_timestamp:
+            return
+
+        columns = _empty_columns(WEATHER_COLUMNS)
+        columns['timestamp'].append(timestamp)
+        for name, _ in WEATHER_COLUMNS[1:]:
+            columns[name].append(_number(getattr(weather, name)))
+        if self.__offer('weather', _day(weather.date), columns):
+            self.__last_weather_timestamp = timestamp
+
+    def __offer(self, kind: str, day: str, columns: dict[str, array]) -> bool:
+        try:
+            self.__queue.put_nowait((kind, day, columns))
+        except asyncio.QueueFull:
+            self.dropped_batches += 1
+            self.__logger.warning(f"Export queue is full, dropped a {kind} batch ({self.dropped_batches} so far)")
+            return False
+        return True
+
+    async def __run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while (item := await self.__queue.get()) is not None:
+            kind, day, columns = item
+            try:
+                await loop.run_in_executor(None, write_batch, self.__directory, kind, day, columns)
+                self.written_batches += 1
+            except OSError as error:
+                self.__logger.error(f"Could not write {kind} export batch: {error}")
@@ -1,42 +1,50 @@
 # coding=utf-8
 
 from abc import ABC
+from array import array
 from dataclasses import dataclass, make_dataclass
+from functools import lru_cache
 
 from marshmallow import Schema, fields, post_load, INCLUDE
-from shapely.geometry import Point as SPoint, Polygon as SPolygon  # type: ignore
 
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class Geometry:
     type: str
-    coordinates: list[list[list[float]]]
+    # Nesting depth depends on the type: three levels for Polygon, four for MultiPolygon.
+    coordinates: list
 
 
 class GeometrySchema(Schema):
     type = fields.Str()
-    coordinates = fields.List(fields.List(fields.List(fields.Float())))
+    coordinates = fields.Raw()
 
     @post_load
     def make_geometry(self, data, **kwargs):
         return Geometry(**data)
 
 
-@dataclass(frozen=True, kw_only=False)
+@dataclass(frozen=True, kw_only=False, slots=True)
 class Properties:
     pass
 
 
+@lru_cache(maxsize=32)
+def properties_class(field_names: tuple[str, ...]) -> type:
+    # One slotted class per distinct property layout, shared by all features of a collection.
+    return make_dataclass('Properties', field_names, bases=(Properties,), frozen=True, slots=True)
+
+
 class PropertiesSchema(Schema):
     class Meta:
         unknown = INCLUDE
 
     @post_load
     def make_properties(self, data, **kwargs):
-        return make_dataclass('Properties', data.keys())(**data)
+        return properties_class(tuple(data.keys()))(**data)
 
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class Feature:
     type: str
     properties: Properties
@@ -53,7 +61,7 @@ class FeatureSchema(Schema):
         return Feature(**data)
 
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class FeatureCollection:
     type: str
     features: list[Feature]
@@ -73,19 +81,23 @@ class FeatureCollectionSchema(Schema):
         return FeatureCollection(**data)
 
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class Coordinate:
     latitude: float
     longitude: float
 
 
 class Shape(ABC):
+    __slots__ = ()
+
     @classmethod
     def from_geometry(cls, geometry: Geometry):
         raise NotImplementedError
 
 
 class Point(Shape):
+    __slots__ = ('coordinate',)
+
     def __init__(self, coordinate: Coordinate):
         self.coordinate = coordinate
 
@@ -98,20 +110,105 @@ class Point(Shape):
 
 
 class Polygon(Shape):
-    def __init__(self, coordinates: list[Coordinate]):
-        self.coordinates = coordinates
+    """GeoJSON Polygon or MultiPolygon, holes included.
+
+    The vertices of all rings are stored back to back in two contiguous float64 arrays. ring_offsets
+    marks where each ring starts and part_offsets which rings make up each polygon part; the first
+    ring of a part is its shell, the rest are holes.
+    """
+    __slots__ = ('latitudes', 'longitudes', 'ring_offsets', 'part_offsets', '_geometry')
+
+    def __init__(
+            self,
+            latitudes: array,
+            longitudes: array,
+            ring_offsets: array | None = None,
+            part_offsets: array | None = None
+    ):
+        self.latitudes: array = latitudes
+        self.longitudes: array = longitudes
+        self.ring_offsets: array = ring_offsets if ring_offsets is not None else array('l', [0, len(latitudes)])
+        self.part_offsets: array = part_offsets if part_offsets is not None else array('l', [0, 1])
+        self._geometry = None
+
+    def __len__(self) -> int:
+        return len(self.latitudes)
 
     def __str__(self):
         return f"Polygon({', '.join([str(coordinate) for coordinate in self.coordinates])})"
 
+    @property
+    def coordinates(self) -> list[Coordinate]:
+        """Shell of the first polygon part."""
+        start, end = self.ring_offsets[0], self.ring_offsets[1]
+        return [
+            Coordinate(latitude=latitude, longitude=longitude)
+            for latitude, longitude in zip(self.latitudes[start:end], self.longitudes[start:end])
+        ]
+
+    def ring(self, index: int) -> list[tuple[float, float]]:
+        start, end = self.ring_offsets[index], self.ring_offsets[index + 1]
+        return list(zip(self.longitudes[start:end], self.latitudes[start:end]))
+
+    @property
+    def geometry(self):
+        """Shapely geometry in (longitude, latitude) order, built on first use."""
+        if self._geometry is None:
+            import shapely  # type: ignore
+
+            parts = [
+                shapely.Polygon(
+                    self.ring(self.part_offsets[part]),
+                    [self.ring(hole) for hole in range(self.part_offsets[part] + 1, self.part_offsets[part + 1])]
+                )
+                for part in range(len(self.part_offsets) - 1)
+            ]
+            self._geometry = parts[0] if len(parts) == 1 else shapely.MultiPolygon(parts)
+        return self._geometry
+
+    @classmethod
+    def from_coordinates(cls, coordinates: list[Coordinate]) -> "Polygon":
+        return Polygon(
+            latitudes=array('d', [coordinate.latitude for coordinate in coordinates]),
+            longitudes=array('d', [coordinate.longitude for coordinate in coordinates]),
+        )
+
     @classmethod
     def from_geometry(cls, geometry: Geometry):
-        coordinates = [
-            Coordinate(latitude=latitude, longitude=longitude) for longitude, latitude, in geometry.coordinates[0]
-        ]
-        return Polygon(coordinates=coordinates)
+        """Raises ValueError for a missing, unsupported or malformed geometry."""
+        if geometry is None:
+            raise ValueError("Missing geometry")
+        if geometry.type == 'Polygon':
+            polygons = [geometry.coordinates]
+        elif geometry.type == 'MultiPolygon':
+            polygons = geometry.coordinates
+        else:
+            raise ValueError(f"Unsupported geometry type: {geometry.type}")
+
+        latitudes, longitudes = array('d'), array('d')
+        ring_offsets, part_offsets = array('l', [0]), array('l', [0])
+        try:
+            for rings in polygons:
+                for ring in rings:
+                    latitudes.extend(float(vertex[1]) for vertex in ring)
+                    longitudes.extend(float(vertex[0]) for vertex in ring)
+                    ring_offsets.append(len(latitudes))
+                part_offsets.append(len(ring_offsets) - 1)
+        except (IndexError, TypeError) as error:
+            raise ValueError(f"Malformed {geometry.type} coordinates: {error}") from error
+        if len(part_offsets) < 2:
+            raise ValueError(f"Empty {geometry.type}")
+
+        return Polygon(
+            latitudes=latitudes,
+            longitudes=longitudes,
+            ring_offsets=ring_offsets,
+            part_offsets=part_offsets,
+        )
 
 
 def point_in_polygon(point: Point, polygon: Polygon) -> bool:
-    return SPoint(point.coordinate.latitude, point.coordinate.longitude).within(
-        SPolygon([(coordinate.latitude, coordinate.longitude) for coordinate in polygon.coordinates]))
+    # shapely is only needed once device trackers are configured, so it is not imported at module load.
+    import shapely  # type: ignore
+
+    return bool(shapely.contains_xy(polygon.geometry, point.coordinate.longitude, point.coordinate.latitude))
@@ -6,6 +6,22 @@ import aiohttp
 import certifi
 from aiohttp import TraceRequestStartParams
 
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+DOWNLOAD_CONNECT_TIMEOUT_SECONDS = 3
+DOWNLOAD_READ_TIMEOUT_SECONDS = 5
+DOWNLOAD_TOTAL_TIMEOUT_SECONDS = 20
+
+
+class ResponseSizeError(Exception):
+    """Raised when a downloaded body is larger than allowed or does not match its announced size."""
+
+
+def check_size(size: int, max_bytes: int, expected_size: int | None) -> None:
+    if size > max_bytes:
+        raise ResponseSizeError(f"Response of {size} bytes exceeds the {max_bytes} byte limit")
+    if expected_size is not None and size != expected_size:
+        raise ResponseSizeError(f"Response of {size} bytes does not match the expected {expected_size} bytes")
+
 
 class HttpClientInterface(ABC):
     @abstractmethod
@@ -16,6 +32,15 @@ class HttpClientInterface(ABC):
     async def make_request_bytes(self, url: str) -> bytes:
         pass
 
+    async def download(self, url: str, max_bytes: int, expected_size: int | None = None) -> bytes:
+        """Binary body of at most max_bytes, which must be exactly expected_size bytes when that is given."""
+        body = await self.make_request_bytes(url)
+        check_size(len(body), max_bytes, expected_size)
+        return body
+
+    async def close(self) -> None:
+        pass
+
 
 class HttpClient(HttpClientInterface):
     def __init__(self, logger: Logger) -> None:
@@ -30,6 +55,12 @@ class HttpClient(HttpClientInterface):
             timeout=aiohttp.ClientTimeout(total=5)
         )
         self.logger: Logger = logger
+        # Downloads fail fast on a dead camera host and on a stalled stream instead of sharing one 5 s budget.
+        self.download_timeout = aiohttp.ClientTimeout(
+            total=DOWNLOAD_TOTAL_TIMEOUT_SECONDS,
+            sock_connect=DOWNLOAD_CONNECT_TIMEOUT_SECONDS,
+            sock_read=DOWNLOAD_READ_TIMEOUT_SECONDS
+        )
 
     async def make_request(self, url: str) -> str:
         async with self.session.get(url) as response:
@@ -39,6 +70,24 @@ class HttpClient(HttpClientInterface):
         async with self.session.get(url) as response:
             return await response.read()
 
+    async def download(self, url: str, max_bytes: int, expected_size: int | None = None) -> bytes:
+        async with self.session.get(url, timeout=self.download_timeout) as response:
+            if response.content_length is not None:
+                # Reject before reading a single byte of the body.
+                check_size(response.content_length, max_bytes, expected_size)
+
+            body = bytearray()
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_BYTES):
+                body.extend(chunk)
+                if len(body) > max_bytes:
+                    raise ResponseSizeError(f"Response from {url} exceeds the {max_bytes} byte limit")
+
+        check_size(len(body), max_bytes, expected_size)
+        return bytes(body)
+
+    async def close(self) -> None:
+        await self.session.close()
+
     async def __on_request_start(
             self,
             session: aiohttp.ClientSession,
@@ -1,4 +1,52 @@
+import asyncio
+import inspect
 from abc import abstractmethod, ABC
+from collections.abc import Awaitable, Callable, Coroutine
+from dataclasses import dataclass
+from logging import Logger
+from typing import Any
+
+# Subscribers take the message type they subscribed to.
+Subscriber = Callable[[Any], Awaitable[None] | None]
+EVENT_TYPE = 'ktw_its_event'
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class ItsEvent:
+    """Base of the messages that are forwarded to Home Assistant as ktw_its_event."""
+    entity_id: str
+
+    def event_data(self) -> dict:
+        return {'device_id': self.entity_id, 'entity_id': self.entity_id}
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class ParkingZoneTransition(ItsEvent):
+    entered: bool
+
+    def event_data(self) -> dict:
+        return {
+            **super(ParkingZoneTransition, self).event_data(),
+            'type': 'parking_zone_enter' if self.entered else 'parking_zone_leave',
+        }
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class TrafficAnomaly(ItsEvent):
+    segment_code: int
+    score: float | None
+    avg_speed: float | None
+    baseline_speed: float | None
+
+    def event_data(self) -> dict:
+        return {
+            **super(TrafficAnomaly, self).event_data(),
+            'type': 'traffic_anomaly',
+            'segment_code': self.segment_code,
+            'score': self.score,
+            'avg_speed': self.avg_speed,
+            'baseline_speed': self.baseline_speed,
+        }
 
 
 class MessageBusInterface(ABC):
@@ -8,16 +56,121 @@ class MessageBusInterface(ABC):
 
 
 class EventBus(MessageBusInterface):
-    def __init__(self) -> None:
-        self.__subscribers: dict[type, list[callable]] = {}
+    """Delivers messages to every subscriber of the message type or any of its base classes.
+
+    Subscribers of one message run concurrently and a failing subscriber is logged without affecting the
+    others. With max_queue_size set, publish() hands messages to a background worker through a bounded
+    queue, so producers only wait when the queue is full.
+    """
+
+    def __init__(
+            self,
+            logger: Logger,
+            max_queue_size: int | None = None,
+            create_task: Callable[[Coroutine, str], asyncio.Task] | None = None
+    ) -> None:
+        self.__logger: Logger = logger
+        self.__create_task: Callable[[Coroutine, str], asyncio.Task] = create_task or (
+            lambda coroutine, name: asyncio.get_running_loop().create_task(coroutine, name=name)
+        )
+        self.__subscribers: dict[type, list[Subscriber]] = {}
+        # Subscribers per concrete message type, resolved along the MRO; reset on every (un)subscribe.
+        self.__resolved: dict[type, tuple[Subscriber, ...]] = {}
+        self.__queue: asyncio.Queue[object] | None = (
+            asyncio.Queue(max_queue_size) if max_queue_size is not None else None
+        )
+        self.__worker: asyncio.Task | None = None
+        self.failures: int = 0
+        self.dropped: int = 0
 
     async def dispatch(self, message: object) -> None:
-        message_type = type(message)
-        if message_type in self.__subscribers:
-            for subscriber in self.__subscribers[message_type]:
-                await subscriber(message)
-
-    def subscribe(self, message_type: type, subscriber: callable) -> None:
-        if message_type not in self.__subscribers:
-            self.__subscribers[message_type] = []
-        self.__subscribers[message_type].append(subscriber)
+        subscribers = self.__subscribers_of(type(message))
+        if len(subscribers) == 1:
+            await self.__deliver(subscribers[0], message)
+        elif subscribers:
+            await asyncio.gather(*(self.__deliver(subscriber, message) for subscriber in subscribers))
+
+    def subscribe(self, message_type: type, subscriber: Subscriber) -> Callable[[], None]:
+        self.__subscribers.setdefault(message_type, []).append(subscriber)
+        self.__resolved.clear()
+
+        def unsubscribe() -> None:
+            subscribers = self.__subscribers.get(message_type, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+                self.__resolved.clear()
+
+        return unsubscribe
+
+    async def publish(self, message: object) -> None:
+        """Queue a message for background dispatch, waiting while the queue is full."""
+        queue = self.__queue
+        if queue is None:
+            await self.dispatch(message)
+            return
+
+        self.__ensure_worker(queue)
+        await queue.put(message)
+
+    def publish_nowait(self, message: object) -> bool:
+        """Queue a message from synchronous code; returns False and drops it when the queue is full."""
+        queue = self.__queue
+        if queue is None:
+            raise RuntimeError("publish_nowait needs an EventBus created with max_queue_size")
+
+        self.__ensure_worker(queue)
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            self.__logger.warning(f"Event queue is full, dropped {type(message).__name__}")
+            return False
+        return True
+
+    @property
+    def pending(self) -> int:
+        return self.__queue.qsize() if self.__queue is not None else 0
+
+    def diagnostics(self) -> dict:
+        return {'pending': self.pending, 'dropped': self.dropped, 'failures': self.failures}
+
+    async def stop(self) -> None:
+        """Dispatch what is still queued, then stop the worker."""
+        if self.__worker is None or self.__queue is None:
+            return
+
+        await self.__queue.join()
+        self.__worker.cancel()
+        await asyncio.gather(self.__worker, return_exceptions=True)
+        self.__worker = None
+
+    def __subscribers_of(self, message_type: type) -> tuple[Subscriber, ...]:
+        subscribers = self.__resolved.get(message_type)
+        if subscribers is None:
+            subscribers = self.__resolved[message_type] = tuple(
+                subscriber
+                for base in message_type.__mro__
+                for subscriber in self.__subscribers.get(base, ())
+            )
+        return subscribers
+
+    async def __deliver(self, subscriber: Subscriber, message: object) -> None:
+        try:
+            result = subscriber(message)
+            if inspect.isawaitable(result):
+                await result
+        except Exception:  # pylint: disable=broad-except
+            self.failures += 1
+            self.__logger.exception(f"Subscriber {subscriber!r} failed to handle {type(message).__name__}")
+
+    def __ensure_worker(self, queue: asyncio.Queue[object]) -> None:
+        if self.__worker is None:
+            self.__worker = self.__create_task(self.__run(queue), "ktw_its event bus")
+
+    async def __run(self, queue: asyncio.Queue[object]) -> None:
+        while True:
+            message = await queue.get()
+            try:
+                await self.dispatch(message)
+            finally:
+                queue.task_done()
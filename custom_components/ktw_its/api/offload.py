@@ -0,0 +1,51 @@
+import asyncio
+import time
+from collections.abc import Callable
+from typing import TypeVar
+
+T = TypeVar('T')
+
+# Payloads below this size decode faster inline than the executor round trip costs.
+OFFLOAD_THRESHOLD_BYTES = 32 * 1024
+
+
+class BlockingTimer:
+    """Accumulates the time spent running synchronous code on the event loop."""
+
+    def __init__(self, on_stop: Callable[[float], None] | None = None) -> None:
+        self.elapsed: float = 0.0
+        # perf_counter() of the current __enter__.
+        self.__started: float = 0.0
+        self.__on_stop: Callable[[float], None] | None = on_stop
+
+    def __enter__(self) -> "BlockingTimer":
+        self.__started = time.perf_counter()
+        return self
+
+    def __exit__(self, *args) -> None:
+        elapsed = time.perf_counter() - self.__started
+        self.elapsed += elapsed
+        if self.__on_stop is not None:
+            self.__on_stop(elapsed)
+
+    @property
+    def elapsed_ms(self) -> float:
+        return self.elapsed * 1000
+
+
+async def run_cpu_bound(
+        payload_size: int,
+        func: Callable[..., T],
+        *args,
+        timer: BlockingTimer | None = None,
+        threshold: int = OFFLOAD_THRESHOLD_BYTES
+) -> T:
+    """Run a decode or model-building function inline for small payloads, in the executor for large ones."""
+    if payload_size >= threshold:
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    if timer is None:
+        return func(*args)
+
+    with timer:
+        return func(*args)
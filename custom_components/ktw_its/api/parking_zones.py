@@ -1,16 +1,25 @@
 # coding=utf-8
+import hashlib
 from dataclasses import dataclass
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timedelta
 from logging import Logger
 
-from homeassistant.core import Event, EventStateChangedData, State, EventBus
+import numpy as np
+import shapely  # type: ignore
+from homeassistant.core import Event, EventStateChangedData, State
 
-from custom_components.ktw_its.api.geo import FeatureCollection, point_in_polygon, Point, Polygon, Coordinate
+from custom_components.ktw_its.api.geo import FeatureCollection, Point, Polygon, Coordinate
+from custom_components.ktw_its.api.cache import StaleWhileRevalidate, TtlCache, estimate_size
+from custom_components.ktw_its.api.clock import ClockInterface, SystemClock
 from custom_components.ktw_its.api.http_client import HttpClientInterface
-from custom_components.ktw_its.dto import KtwItsSensorDto
+from custom_components.ktw_its.api.messenger import EventBus, ParkingZoneTransition
+from custom_components.ktw_its.api.offload import run_cpu_bound
+from custom_components.ktw_its.api.watchdog import BlockingWatchdog
 
+PARKING_ZONES_KEY = 'parking_zones'
 
-@dataclass(frozen=True, kw_only=True)
+
+@dataclass(frozen=True, kw_only=True, slots=True)
 class ParkingZone:
     code: str
     polygon: Polygon
@@ -19,28 +28,92 @@ class ParkingZone:
         return f"ParkingZone[code={self.code}]"
 
 
+class ParkingZoneIndex:
+    """Immutable snapshot of the zones with their geometries in one prepared shapely array.
+
+    Point containment for any number of points against every zone is a single contains_xy call.
+    """
+    __slots__ = ('zones', 'geometries')
+
+    def __init__(self, zones: list[ParkingZone]) -> None:
+        self.zones: dict[str, ParkingZone] = {zone.code: zone for zone in zones}
+        self.geometries = np.array([zone.polygon.geometry for zone in self.zones.values()], dtype=object)
+        shapely.prepare(self.geometries)
+
+    def __len__(self) -> int:
+        return len(self.zones)
+
+    def vertex_count(self) -> int:
+        return sum(len(zone.polygon) for zone in self.zones.values())
+
+    def find_by_points(self, longitudes: list[float], latitudes: list[float]) -> list[ParkingZone | None]:
+        if not self.zones or not longitudes:
+            return [None] * len(longitudes)
+
+        # Rows are zones, columns are points.
+        matches = shapely.contains_xy(
+            self.geometries[:, np.newaxis], np.asarray(longitudes, dtype=float), np.asarray(latitudes, dtype=float)
+        )
+        first_match = matches.argmax(axis=0)
+        has_match = matches.any(axis=0)
+        zones = list(self.zones.values())
+
+        return [zones[first_match[i]] if has_match[i] else None for i in range(len(longitudes))]
+
+
+def build_parking_zone_index(json_data: str, logger: Logger) -> ParkingZoneIndex:
+    """Zones with an unsupported or invalid geometry are skipped with a warning; the rest still load."""
+    feature_collection = FeatureCollection.from_json(json_data=json_data)
+    zones = []
+    for feature in feature_collection.features:
+        try:
+            polygon = Polygon.from_geometry(geometry=feature.geometry)
+            # Built here, so a ring shapely rejects fails its own zone rather than the whole index.
+            _ = polygon.geometry
+        except (ValueError, shapely.errors.ShapelyError) as error:
+            logger.warning(f"Skipping parking zone {feature.properties.code}: {error}")
+            continue
+        zones.append(ParkingZone(code=feature.properties.code, polygon=polygon))
+    return ParkingZoneIndex(zones)
+
+
 class ParkingZoneRepository:
-    def __init__(self, logger: Logger) -> None:
-        self.__parking_zones: dict[str, ParkingZone] = {}
+    def __init__(self, logger: Logger, watchdog: BlockingWatchdog | None = None) -> None:
+        self.__index: ParkingZoneIndex = ParkingZoneIndex([])
         self.__logger: Logger = logger
+        self.__watchdog: BlockingWatchdog = watchdog or BlockingWatchdog(logger=logger)
 
     def add_parking_zone(self, parking_zone: ParkingZone) -> None:
         self.__logger.debug(f"Adding parking zone: {parking_zone}")
-        self.__parking_zones[parking_zone.code] = parking_zone
+        self.replace_index(ParkingZoneIndex([*self.__index.zones.values(), parking_zone]))
+
+    def replace_all(self, parking_zones: list[ParkingZone]) -> None:
+        self.replace_index(ParkingZoneIndex(parking_zones))
+
+    def replace_index(self, index: ParkingZoneIndex) -> None:
+        # Lookups hold a reference to the previous index, so they never see a half-built snapshot.
+        self.__index = index
+        self.__logger.debug(f"Replaced parking zones snapshot with {len(index)} zones")
+
+    @property
+    def index(self) -> ParkingZoneIndex:
+        return self.__index
 
     def get_parking_zone(self, name: str) -> ParkingZone | None:
-        return self.__parking_zones.get(name)
+        return self.__index.zones.get(name)
 
     def get_all(self) -> dict[str, ParkingZone]:
-        return self.__parking_zones
+        return self.__index.zones
 
     def find_by_point(self, point: Point) -> ParkingZone | None:
-        self.__logger.debug(f"Finding parking zone for point: {point}")
-        for parking_zone in self.__parking_zones.values():
-            self.__logger.debug(f"Checking parking zone: {parking_zone}")
-            if point_in_polygon(point=point, polygon=parking_zone.polygon):
-                return parking_zone
-        return None
+        return self.find_by_points([point])[0]
+
+    def find_by_points(self, points: list[Point]) -> list[ParkingZone | None]:
+        with self.__watchdog.section('parking_zones.find_by_point'):
+            return self.__index.find_by_points(
+                [point.coordinate.longitude for point in points],
+                [point.coordinate.latitude for point in points]
+            )
 
 
 class ParkingZonesApi:
@@ -49,67 +122,93 @@ class ParkingZonesApi:
             http_client: HttpClientInterface,
             repository: ParkingZoneRepository,
             event_bus: EventBus,
-            logger: Logger
+            logger: Logger,
+            clock: ClockInterface | None = None,
+            watchdog: BlockingWatchdog | None = None,
+            revalidator: StaleWhileRevalidate | None = None
     ) -> None:
         self.__http_client: HttpClientInterface = http_client
+        self.__clock: ClockInterface = clock or SystemClock()
+        self.__watchdog: BlockingWatchdog = watchdog or BlockingWatchdog(logger=logger)
+        self.__revalidator: StaleWhileRevalidate = revalidator or StaleWhileRevalidate(logger=logger)
         self.__repository: ParkingZoneRepository = repository
         self.__event_bus: EventBus = event_bus
         self.__logger: Logger = logger
-        self.__parking_zones_data: dict[str, KtwItsSensorDto] = {}
-        self.__parking_zones_data_valid_to: datetime | None = None
+        # The cached value is the fingerprint of the payload the current index was built from.
+        self.__cache: TtlCache[str, str] = TtlCache(
+            name='parking zones',
+            loader=self.__load_parking_zones,
+            logger=logger,
+            clock=self.__clock,
+            revalidator=self.__revalidator
+        )
 
     async def fetch_data(self) -> None:
         self.__logger.debug("Fetching parking zones data")
-        if (self.__parking_zones_data_valid_to is not None
-                and self.__parking_zones_data_valid_to >= datetime.now(timezone.utc)):
-            self.__logger.debug("Parking zones data is still valid")
-            return
-
+        await self.__cache.get(PARKING_ZONES_KEY)
+
+    def diagnostics(self) -> dict:
+        index = self.__repository.index
+        vertices = index.vertex_count()
+        valid_to = self.__cache.valid_to(PARKING_ZONES_KEY)
+        return {
+            **self.__cache.as_dict(),
+            'valid_to': valid_to.isoformat() if valid_to else None,
+            'spatial_index': {
+                'zones': len(index),
+                'vertices': vertices,
+                # Shapely keeps its own copy of every vertex as a pair of float64.
+                'estimated_bytes': estimate_size(index.zones) + vertices * 16,
+            },
+        }
+
+    async def __load_parking_zones(self, key: str) -> tuple[str, datetime]:
         parking_zones_json = await self.__http_client.make_request('https://its.katowice.eu/api/parkingZones')
-        feature_collection = FeatureCollection.from_json(json_data=parking_zones_json)
-        for feature in feature_collection.features:
-            self.__repository.add_parking_zone(
-                ParkingZone(
-                    code=feature.properties.code,
-                    polygon=Polygon.from_geometry(geometry=feature.geometry)
-                )
-            )
-        self.__parking_zones_data_valid_to = datetime.now(timezone.utc) + timedelta(minutes=60)
+        fingerprint = hashlib.sha256(parking_zones_json.encode('utf-8')).hexdigest()
+        if fingerprint == self.__cache.peek(key):
+            self.__logger.debug("Parking zones payload is unchanged, skipping rebuild")
+            return fingerprint, self.__clock.now() + timedelta(minutes=60)
+
+        parse = self.__watchdog.section('parking_zones.parse')
+        index = await run_cpu_bound(
+            len(parking_zones_json), build_parking_zone_index, parking_zones_json, self.__logger, timer=parse
+        )
+        with self.__watchdog.section('parking_zones.build') as build:
+            self.__repository.replace_index(index)
+        self.__logger.debug(
+            f"Parking zones refresh blocked the event loop for {parse.elapsed_ms + build.elapsed_ms:.1f} ms"
+        )
+
+        return fingerprint, self.__clock.now() + timedelta(minutes=60)
 
     def on_entity_state_change(self, event: Event[EventStateChangedData]) -> None:
-        old_zone: ParkingZone | None = None
-        new_zone: ParkingZone | None = None
         entity_id: str = event.data["entity_id"]
-        old_state: State | None = event.data["old_state"]
-        new_state: State | None = event.data["new_state"]
-
-        if old_state is not None:
-            old_zone = self.__repository.find_by_point(point=Point(Coordinate(
-                latitude=old_state.attributes.get('latitude'),  # type: ignore
-                longitude=old_state.attributes.get('longitude')  # type: ignore
-            )))
+        old_point = self.__state_point(event.data["old_state"])
+        new_point = self.__state_point(event.data["new_state"])
 
-        if new_state is not None:
-            new_zone = self.__repository.find_by_point(point=Point(Coordinate(
-                latitude=new_state.attributes.get('latitude'),  # type: ignore
-                longitude=new_state.attributes.get('longitude')  # type: ignore
-            )))
+        points = [point for point in (old_point, new_point) if point is not None]
+        zones = iter(self.__repository.find_by_points(points=points))
+        old_zone: ParkingZone | None = next(zones) if old_point is not None else None
+        new_zone: ParkingZone | None = next(zones) if new_point is not None else None
 
         if old_zone != new_zone:
             self.__logger.debug(f"Entity {entity_id} changed zone from {old_zone} to {new_zone}")
 
+            # Queued, so a burst of tracker updates never waits on the subscribers.
             if old_zone is not None:
-                event_data = {
-                    "device_id": entity_id,
-                    "entity_id": entity_id,
-                    "type": "parking_zone_leave",
-                }
-                self.__event_bus.async_fire("ktw_its_event", event_data)
+                self.__event_bus.publish_nowait(ParkingZoneTransition(entity_id=entity_id, entered=False))
 
             if new_zone is not None:
-                event_data = {
-                    "device_id": entity_id,
-                    "entity_id": entity_id,
-                    "type": "parking_zone_enter",
-                }
-                self.__event_bus.async_fire("ktw_its_event", event_data)
+                self.__event_bus.publish_nowait(ParkingZoneTransition(entity_id=entity_id, entered=True))
+
+    @staticmethod
+    def __state_point(state: State | None) -> Point | None:
+        if state is None:
+            return None
+
+        latitude = state.attributes.get('latitude')
+        longitude = state.attributes.get('longitude')
+        if latitude is None or longitude is None:
+            return None
+
+        return Point(Coordinate(latitude=latitude, longitude=longitude))
@@ -0,0 +1,77 @@
+import asyncio
+from collections.abc import Callable, Coroutine
+from datetime import datetime, timedelta
+from logging import Logger
+from typing import TYPE_CHECKING
+
+from custom_components.ktw_its.api.clock import ClockInterface, SystemClock
+from custom_components.ktw_its.api.scheduler import Priority, prioritized
+
+if TYPE_CHECKING:
+    from custom_components.ktw_its.api.camera import CameraApi
+
+# Upstream publishes the new image list a little after the previous one expires.
+PUBLISH_GRACE = timedelta(seconds=10)
+MIN_INTERVAL = timedelta(seconds=30)
+RETRY_INTERVAL = timedelta(minutes=2)
+
+
+class CameraPrewarmer:
+    """Keeps the newest frames of favorite cameras in memory so opening them never waits on upstream, and
+    captures the frames of archived cameras as they are published.
+
+    Each camera is refetched when its image list is due to rotate, which follows the upstream addTime,
+    and at background priority so it never delays coordinator refreshes or interactive views. Favorites'
+    image lists are pinned, so views between the rotation and the refetch are served the stale list.
+    """
+
+    def __init__(
+            self,
+            camera_api: "CameraApi",
+            logger: Logger,
+            clock: ClockInterface | None = None,
+            create_task: Callable[[Coroutine, str], asyncio.Task] | None = None
+    ) -> None:
+        self.__camera_api: CameraApi = camera_api
+        self.__logger: Logger = logger
+        self.__clock: ClockInterface = clock or SystemClock()
+        self.__create_task: Callable[[Coroutine, str], asyncio.Task] = create_task or (
+            lambda coroutine, name: asyncio.get_running_loop().create_task(coroutine, name=name)
+        )
+        self.__tasks: dict[int, asyncio.Task] = {}
+
+    @property
+    def camera_ids(self) -> set[int]:
+        return set(self.__tasks)
+
+    def set_cameras(self, camera_ids: set[int]) -> None:
+        for camera_id in set(self.__tasks) - camera_ids:
+            self.__tasks.pop(camera_id).cancel()
+
+        for camera_id in camera_ids - set(self.__tasks):
+            self.__tasks[camera_id] = self.__create_task(self.__run(camera_id), f"ktw_its prewarm camera {camera_id}")
+
+    async def stop(self) -> None:
+        tasks = list(self.__tasks.values())
+        self.__tasks = {}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def __run(self, camera_id: int) -> None:
+        while True:
+            next_rotation: datetime | None = None
+            try:
+                with prioritized(Priority.BACKGROUND):
+                    next_rotation = await self.__camera_api.prewarm(camera_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:  # pylint: disable=broad-except
+                self.__logger.warning(f"Pre-warming camera {camera_id} failed: {error}")
+
+            if next_rotation is None:
+                delay = RETRY_INTERVAL
+            else:
+                delay = max(MIN_INTERVAL, next_rotation + PUBLISH_GRACE - self.__clock.now())
+            self.__logger.debug(f"Pre-warming camera {camera_id} again in {delay.total_seconds():.0f} s")
+            await asyncio.sleep(delay.total_seconds())
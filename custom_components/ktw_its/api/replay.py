@@ -0,0 +1,129 @@
+import base64
+import json
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+from logging import Logger
+
+from custom_components.ktw_its.api.clock import ClockInterface, SimulatedClock, SystemClock
+from custom_components.ktw_its.api.http_client import HttpClientInterface
+
+
+class RecordingNotFound(Exception):
+    """Raised when the replayed session has no response for the requested url."""
+
+
+@dataclass(frozen=True, slots=True)
+class Recording:
+    url: str
+    recorded_at: datetime
+    body: bytes
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'url': self.url,
+            'recorded_at': self.recorded_at.isoformat(),
+            'body': base64.b64encode(self.body).decode('ascii'),
+        })
+
+    @classmethod
+    def from_json(cls, json_data: str) -> "Recording":
+        data = json.loads(json_data)
+        return Recording(
+            url=data['url'],
+            recorded_at=datetime.fromisoformat(data['recorded_at']),
+            body=base64.b64decode(data['body']),
+        )
+
+
+class RecordingHttpClient(HttpClientInterface):
+    """Passes requests to another client and keeps every response with the time it was received."""
+
+    def __init__(self, http_client: HttpClientInterface, logger: Logger, clock: ClockInterface | None = None) -> None:
+        self.__http_client: HttpClientInterface = http_client
+        self.__logger: Logger = logger
+        self.__clock: ClockInterface = clock or SystemClock()
+        self.__recordings: list[Recording] = []
+
+    @property
+    def recordings(self) -> list[Recording]:
+        return self.__recordings
+
+    async def make_request(self, url: str) -> str:
+        text = await self.__http_client.make_request(url)
+        self.__record(url, text.encode('utf-8'))
+        return text
+
+    async def make_request_bytes(self, url: str) -> bytes:
+        body = await self.__http_client.make_request_bytes(url)
+        self.__record(url, body)
+        return body
+
+    async def download(self, url: str, max_bytes: int, expected_size: int | None = None) -> bytes:
+        body = await self.__http_client.download(url, max_bytes, expected_size)
+        self.__record(url, body)
+        return body
+
+    def save(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as file:
+            for recording in self.__recordings:
+                file.write(recording.to_json() + '\n')
+        self.__logger.debug(f"Saved {len(self.__recordings)} recordings to {path}")
+
+    def __record(self, url: str, body: bytes) -> None:
+        self.__recordings.append(Recording(url=url, recorded_at=self.__clock.now(), body=body))
+
+
+class ReplayHttpClient(HttpClientInterface):
+    """Serves recorded responses back, picking for each url the newest one recorded before clock.now().
+
+    Pair it with a SimulatedClock passed to the APIs as well, so their validity windows expire in step
+    with the recording.
+    """
+
+    def __init__(self, recordings: list[Recording], logger: Logger, clock: ClockInterface | None = None) -> None:
+        self.__logger: Logger = logger
+        self.__recordings: dict[str, list[Recording]] = {}
+        for recording in sorted(recordings, key=lambda item: item.recorded_at):
+            self.__recordings.setdefault(recording.url, []).append(recording)
+        self.__timestamps: dict[str, list[datetime]] = {
+            url: [recording.recorded_at for recording in items] for url, items in self.__recordings.items()
+        }
+        self.__clock: ClockInterface = clock or SimulatedClock(start=self.start, speed=1.0)
+        self.request_count: dict[str, int] = {}
+
+    @property
+    def clock(self) -> ClockInterface:
+        return self.__clock
+
+    @property
+    def start(self) -> datetime:
+        return min(timestamps[0] for timestamps in self.__timestamps.values())
+
+    @property
+    def end(self) -> datetime:
+        return max(timestamps[-1] for timestamps in self.__timestamps.values())
+
+    @classmethod
+    def from_file(cls, path: str, logger: Logger, clock: ClockInterface | None = None) -> "ReplayHttpClient":
+        with open(path, encoding='utf-8') as file:
+            recordings = [Recording.from_json(line) for line in file if line.strip()]
+        return ReplayHttpClient(recordings=recordings, logger=logger, clock=clock)
+
+    async def make_request(self, url: str) -> str:
+        return self.__replay(url).decode('utf-8')
+
+    async def make_request_bytes(self, url: str) -> bytes:
+        return self.__replay(url)
+
+    def __replay(self, url: str) -> bytes:
+        recordings = self.__recordings.get(url)
+        if not recordings:
+            raise RecordingNotFound(url)
+
+        self.request_count[url] = self.request_count.get(url, 0) + 1
+        index = bisect_right(self.__timestamps[url], self.__clock.now())
+        recording = recordings[max(index - 1, 0)]
+        self.__logger.debug(f"Replaying {url} recorded at {recording.recorded_at}")
+
+        return recording.body
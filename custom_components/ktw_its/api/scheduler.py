@@ -0,0 +1,173 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from logging import Logger
+
+from custom_components.ktw_its.api.http_client import HttpClientInterface
+
+DEFAULT_RATE_PER_SECOND = 2.0
+DEFAULT_BURST = 10
+WAIT_WARNING_SECONDS = 10.0
+
+
+class Priority(IntEnum):
+    """Lower values are served first."""
+    CRITICAL = 0
+    INTERACTIVE = 1
+    BACKGROUND = 2
+
+
+# Priority of the upstream requests made from the current task; coordinator refreshes run at the default.
+request_priority: ContextVar[Priority] = ContextVar('request_priority', default=Priority.CRITICAL)
+
+
+@contextmanager
+def prioritized(priority: Priority) -> Iterator[None]:
+    token = request_priority.set(priority)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class PriorityStats:
+    __slots__ = ('requests', 'waited', 'total_wait', 'max_wait')
+
+    def __init__(self) -> None:
+        self.requests: int = 0
+        self.waited: int = 0
+        self.total_wait: float = 0.0
+        self.max_wait: float = 0.0
+
+    def record(self, wait: float) -> None:
+        self.requests += 1
+        if wait > 0:
+            self.waited += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def as_dict(self) -> dict[str, float | int]:
+        return {
+            'requests': self.requests,
+            'waited': self.waited,
+            'mean_wait_ms': round(self.total_wait / self.requests * 1000, 3) if self.requests else 0.0,
+            'max_wait_ms': round(self.max_wait * 1000, 3),
+        }
+
+
+class RequestScheduler:
+    """Token bucket shared by every upstream request.
+
+    Up to `burst` requests go out at once, after that `rate_per_second`. Requests that have to wait are
+    released strictly by priority, then in arrival order.
+    """
+
+    def __init__(
+            self,
+            logger: Logger,
+            rate_per_second: float = DEFAULT_RATE_PER_SECOND,
+            burst: int = DEFAULT_BURST,
+            monotonic: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.__logger: Logger = logger
+        self.__rate: float = rate_per_second
+        self.__burst: int = burst
+        self.__monotonic: Callable[[], float] = monotonic
+        self.__tokens: float = float(burst)
+        self.__updated: float = monotonic()
+        self.__waiters: list[tuple[Priority, int, asyncio.Future]] = []
+        self.__sequence: Iterator[int] = itertools.count()
+        self.__timer: asyncio.TimerHandle | None = None
+        self.__stats: dict[Priority, PriorityStats] = {priority: PriorityStats() for priority in Priority}
+
+    async def acquire(self, priority: Priority) -> None:
+        self.__refill()
+        if not self.__waiters and self.__tokens >= 1:
+            self.__tokens -= 1
+            self.__stats[priority].record(0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.__waiters, (priority, next(self.__sequence), future))
+        started = self.__monotonic()
+        self.__schedule_release()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted but never used, hand the token back.
+                self.__tokens = min(self.__burst, self.__tokens + 1)
+            raise
+
+        wait = self.__monotonic() - started
+        self.__stats[priority].record(wait)
+        if wait > WAIT_WARNING_SECONDS:
+            self.__logger.warning(f"{priority.name} request waited {wait:.1f} s for the upstream request budget")
+
+    def queue_depth(self) -> dict[str, int]:
+        depth = {priority.name: 0 for priority in Priority}
+        for priority, _, future in self.__waiters:
+            if not future.done():
+                depth[priority.name] += 1
+        return depth
+
+    def as_dict(self) -> dict:
+        return {
+            'rate_per_second': self.__rate,
+            'burst': self.__burst,
+            'tokens': round(self.__tokens, 3),
+            'queue_depth': self.queue_depth(),
+            'priorities': {priority.name: stats.as_dict() for priority, stats in self.__stats.items()},
+        }
+
+    def __refill(self) -> None:
+        now = self.__monotonic()
+        self.__tokens = min(self.__burst, self.__tokens + (now - self.__updated) * self.__rate)
+        self.__updated = now
+
+    def __schedule_release(self) -> None:
+        if self.__timer is not None or not self.__waiters:
+            return
+
+        self.__refill()
+        delay = max(0.0, (1 - self.__tokens) / self.__rate)
+        self.__timer = asyncio.get_running_loop().call_later(delay, self.__release)
+
+    def __release(self) -> None:
+        self.__timer = None
+        self.__refill()
+        while self.__waiters and self.__tokens >= 1:
+            _, _, future = heapq.heappop(self.__waiters)
+            if future.done():
+                continue
+            self.__tokens -= 1
+            future.set_result(None)
+        self.__schedule_release()
+
+
+class ScheduledHttpClient(HttpClientInterface):
+    """Passes requests to another client once the scheduler grants them, at the caller's request_priority."""
+
+    def __init__(self, http_client: HttpClientInterface, scheduler: RequestScheduler) -> None:
+        self.__http_client: HttpClientInterface = http_client
+        self.__scheduler: RequestScheduler = scheduler
+
+    async def make_request(self, url: str) -> str:
+        await self.__scheduler.acquire(request_priority.get())
+        return await self.__http_client.make_request(url)
+
+    async def make_request_bytes(self, url: str) -> bytes:
+        await self.__scheduler.acquire(request_priority.get())
+        return await self.__http_client.make_request_bytes(url)
+
+    async def download(self, url: str, max_bytes: int, expected_size: int | None = None) -> bytes:
+        await self.__scheduler.acquire(request_priority.get())
+        return await self.__http_client.download(url, max_bytes, expected_size)
+
+    async def close(self) -> None:
+        await self.__http_client.close()
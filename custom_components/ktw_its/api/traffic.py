@@ -1,9 +1,18 @@
+import json
 from collections.abc import Iterable
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timedelta
 from logging import Logger
 
 
+from custom_components.ktw_its.api.cache import StaleWhileRevalidate, TtlCache, estimate_size
+from custom_components.ktw_its.api.clock import ClockInterface, SystemClock
+from custom_components.ktw_its.api.congestion_map import CongestionMap, MapSegment
+from custom_components.ktw_its.api.export import SnapshotExporter
 from custom_components.ktw_its.api.http_client import HttpClientInterface
+from custom_components.ktw_its.api.messenger import EventBus, TrafficAnomaly
+from custom_components.ktw_its.api.offload import run_cpu_bound
+from custom_components.ktw_its.api.traffic_anomaly import TrafficAnomalyDetector, SpeedReading
+from custom_components.ktw_its.api.watchdog import BlockingWatchdog
 from custom_components.ktw_its.dto import KtwItsSensorDto
 from custom_components.ktw_its.sensor import KtwItsSensorEntityDescription
 from homeassistant.helpers.device_registry import DeviceInfo, DeviceEntryType
@@ -16,7 +25,7 @@ from dataclasses import dataclass
 from typing import List, Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class PropertiesData:
     avg_speed: int | None = None
     avg_time: float | None = None
@@ -26,7 +35,7 @@ class PropertiesData:
     color: str | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Properties:
     name: str
     description: str
@@ -34,28 +43,34 @@ class Properties:
     data: PropertiesData
 
 
-@dataclass
+@dataclass(slots=True)
 class Geometry:
     type: str
     coordinates: List[List[List[float]]]
 
 
-@dataclass
+@dataclass(slots=True)
 class Feature:
     type: str
     properties: Properties
     geometry: Geometry
 
 
-@dataclass
+@dataclass(slots=True)
 class FeatureCollection:
     type: str
     features: List[Feature]
 
     @classmethod
-    def from_json(cls, json_data: str) -> "FeatureCollection":
-        future_collection: FeatureCollection = FeatureCollectionSchema().loads(json_data=json_data)
-        return future_collection
+    def from_json(cls, json_data: str, codes: set[int] | None = None) -> "FeatureCollection":
+        if codes is None:
+            future_collection: FeatureCollection = FeatureCollectionSchema().loads(json_data=json_data)
+            return future_collection
+
+        # Drop unselected segments before the schema builds objects for them.
+        data = json.loads(json_data)
+        data['features'] = [feature for feature in data['features'] if feature['properties']['code'] in codes]
+        return FeatureCollectionSchema().load(data)
 
     def get_newest_datetime(self) -> Optional[datetime]:
         if not self.features:
@@ -117,23 +132,103 @@ class FeatureCollectionSchema(Schema):
         return FeatureCollection(**data)
 
 
+def list_segments(json_data: str) -> dict[int, str]:
+    return {
+        feature['properties']['code']: f"{feature['properties']['name']} [{feature['properties']['code']}]"
+        for feature in json.loads(json_data)['features']
+    }
+
+
+def map_segments(features: list[Feature]) -> list[MapSegment]:
+    return [
+        MapSegment(
+            code=feature.properties.code,
+            color=feature.properties.data.color,
+            avg_speed=feature.properties.data.avg_speed,
+            lines=tuple(tuple((point[0], point[1]) for point in line) for line in feature.geometry.coordinates),
+        )
+        for feature in features
+    ]
+
+
+TRAFFIC_KEY = 'traffic'
+
+
 class TrafficApi:
-    def __init__(self, http_client: HttpClientInterface, logger: Logger) -> None:
+    def __init__(
+            self,
+            http_client: HttpClientInterface,
+            logger: Logger,
+            clock: ClockInterface | None = None,
+            watchdog: BlockingWatchdog | None = None,
+            event_bus: EventBus | None = None,
+            revalidator: StaleWhileRevalidate | None = None
+    ) -> None:
         self.http_client: HttpClientInterface = http_client
         self.logger: Logger = logger
-        self.traffic_data: dict[str, KtwItsSensorDto] = {}
-        self.traffic_data_valid_to: datetime | None = None
+        self.clock: ClockInterface = clock or SystemClock()
+        self.watchdog: BlockingWatchdog = watchdog or BlockingWatchdog(logger=logger)
+        self.event_bus: EventBus | None = event_bus
+        self.revalidator: StaleWhileRevalidate = revalidator or StaleWhileRevalidate(logger=logger)
+        self.anomaly_detector: TrafficAnomalyDetector = TrafficAnomalyDetector()
+        self.selected_codes: set[int] | None = None
+        self.exporter: SnapshotExporter | None = None
+        self.congestion_map: CongestionMap = CongestionMap(logger=logger, clock=self.clock)
+        self.cache: TtlCache[str, dict[str, KtwItsSensorDto]] = TtlCache(
+            name='traffic',
+            loader=self.__load_traffic_data,
+            logger=logger,
+            clock=self.clock,
+            revalidator=self.revalidator
+        )
 
     async def fetch_data(self) -> dict[str, KtwItsSensorDto]:
-        if self.traffic_data_valid_to is not None and self.traffic_data_valid_to >= datetime.now(timezone.utc):
-            self.logger.debug('Traffic data is still valid')
-            return self.traffic_data
-
+        return await self.cache.get(TRAFFIC_KEY)
+
+    def diagnostics(self) -> dict:
+        valid_to = self.cache.valid_to(TRAFFIC_KEY)
+        return {
+            **self.cache.as_dict(),
+            'valid_to': valid_to.isoformat() if valid_to else None,
+            'anomaly_baselines': {
+                'segments': len(self.anomaly_detector),
+                'estimated_bytes': estimate_size(self.anomaly_detector),
+            },
+            'congestion_map': self.congestion_map.diagnostics(),
+        }
+
+    async def __load_traffic_data(self, key: str) -> tuple[dict[str, KtwItsSensorDto], datetime]:
         traffic_json = await self.http_client.make_request('https://its.katowice.eu/api/traffic')
-        feature_collection = FeatureCollection.from_json(traffic_json)
+        parse = self.watchdog.section('traffic.parse')
+        feature_collection = await run_cpu_bound(
+            len(traffic_json), FeatureCollection.from_json, traffic_json, self.selected_codes, timer=parse
+        )
+
+        with self.watchdog.section('traffic.build') as build:
+            # Built from scratch every time, so segments that disappear upstream drop out of the cache.
+            traffic_data = self.__build_traffic_data(feature_collection)
+            if self.exporter is not None:
+                self.exporter.add_traffic(feature_collection.features)
+        self.logger.debug(f'Traffic refresh blocked the event loop for {parse.elapsed_ms + build.elapsed_ms:.1f} ms')
+        await self.congestion_map.update(map_segments(feature_collection.features))
+
+        newest_datetime = feature_collection.get_newest_datetime() or self.clock.now()
+        return traffic_data, newest_datetime + timedelta(minutes=5)
+
+    async def fetch_segments(self) -> dict[int, str]:
+        traffic_json = await self.http_client.make_request('https://its.katowice.eu/api/traffic')
+        return await run_cpu_bound(len(traffic_json), list_segments, traffic_json)
+
+    def set_selection(self, codes: set[int] | None) -> None:
+        if codes == self.selected_codes:
+            return
 
-        self.traffic_data_valid_to = (feature_collection.get_newest_datetime() + timedelta(minutes=5))
+        self.selected_codes = codes
+        self.cache.invalidate()
 
+    def __build_traffic_data(self, feature_collection: FeatureCollection) -> dict[str, KtwItsSensorDto]:
+        traffic_data: dict[str, KtwItsSensorDto] = {}
+        segments: dict[int, tuple[Feature, DeviceInfo]] = {}
         for feature in feature_collection.features:
             if feature.properties.data.date_time is None:
                 continue
@@ -154,10 +249,11 @@ class TrafficApi:
                 serial_number=feature.properties.description,
                 configuration_url='https://its.katowice.eu',
             )
+            segments[feature.properties.code] = (feature, device_info)
 
             key = DOMAIN + '_' + str(feature.properties.code) + '_avg_speed'
 
-            self.traffic_data.update([(
+            traffic_data.update([(
                 key,
                 KtwItsSensorDto(
                     state=feature.properties.data.avg_speed,
@@ -166,6 +262,7 @@ class TrafficApi:
                     KtwItsSensorEntityDescription(
                         group='traffic',
                         key=key,
+                        source_id=str(feature.properties.code),
                         name='Average speed',
                         device_class=SensorDeviceClass.SPEED,
                         native_unit_of_measurement=UnitOfSpeed.KILOMETERS_PER_HOUR,
@@ -176,7 +273,7 @@ class TrafficApi:
 
             key = DOMAIN + '_' + str(feature.properties.code) + '_avg_time'
 
-            self.traffic_data.update([(
+            traffic_data.update([(
                 key,
                 KtwItsSensorDto(
                     state=feature.properties.data.avg_time,
@@ -185,6 +282,7 @@ class TrafficApi:
                     KtwItsSensorEntityDescription(
                         group='traffic',
                         key=key,
+                        source_id=str(feature.properties.code),
                         name='Average time',
                         device_class=SensorDeviceClass.DURATION,
                         native_unit_of_measurement=UnitOfTime.SECONDS,
@@ -196,7 +294,7 @@ class TrafficApi:
 
             key = DOMAIN + '_' + str(feature.properties.code) + '_traffic'
 
-            self.traffic_data.update([(
+            traffic_data.update([(
                 key,
                 KtwItsSensorDto(
                     state=feature.properties.data.traffic,
@@ -205,6 +303,7 @@ class TrafficApi:
                     KtwItsSensorEntityDescription(
                         group='traffic',
                         key=key,
+                        source_id=str(feature.properties.code),
                         name='Traffic',
                         device_class=None,
                         native_unit_of_measurement=None,
@@ -217,7 +316,7 @@ class TrafficApi:
 
             key = DOMAIN + '_' + str(feature.properties.code) + '_traffic_flow_per_hour'
 
-            self.traffic_data.update([(
+            traffic_data.update([(
                 key,
                 KtwItsSensorDto(
                     state=int((60 / feature.properties.data.traffic_period * feature.properties.data.traffic)),
@@ -226,6 +325,7 @@ class TrafficApi:
                     KtwItsSensorEntityDescription(
                         group='traffic',
                         key=key,
+                        source_id=str(feature.properties.code),
                         name='Traffic flow per hour',
                         device_class=None,
                         native_unit_of_measurement='vehicle/h',
@@ -237,7 +337,7 @@ class TrafficApi:
 
             key = DOMAIN + '_' + str(feature.properties.code) + '_traffic_period'
 
-            self.traffic_data.update([(
+            traffic_data.update([(
                 key,
                 KtwItsSensorDto(
                     state=str(feature.properties.data.traffic_period),
@@ -246,6 +346,7 @@ class TrafficApi:
                     KtwItsSensorEntityDescription(
                         group='traffic',
                         key=key,
+                        source_id=str(feature.properties.code),
                         name='Traffic period',
                         device_class=SensorDeviceClass.ENUM,
                         native_unit_of_measurement=None,
@@ -258,4 +359,54 @@ class TrafficApi:
                 )
             )])
 
-        return self.traffic_data
+        self.__update_anomaly_data(segments, traffic_data)
+
+        return traffic_data
+
+    def __update_anomaly_data(
+            self,
+            segments: dict[int, tuple[Feature, DeviceInfo]],
+            traffic_data: dict[str, KtwItsSensorDto]
+    ) -> None:
+        scores = self.anomaly_detector.update([
+            SpeedReading(
+                code=code,
+                date_time=feature.properties.data.date_time,
+                avg_speed=feature.properties.data.avg_speed
+            )
+            for code, (feature, _) in segments.items() if feature.properties.data.avg_speed is not None
+        ])
+
+        for code, score in scores.items():
+            feature, device_info = segments[code]
+            key = DOMAIN + '_' + str(code) + '_speed_anomaly'
+
+            traffic_data[key] = KtwItsSensorDto(
+                state=score.score,
+                state_attributes={
+                    STATE_ATTR_UPDATE_DATE: feature.properties.data.date_time,
+                    'baseline_speed': score.baseline_speed,
+                    'baseline_std': score.baseline_std,
+                    'samples': score.samples,
+                },
+                entity_description=KtwItsSensorEntityDescription(
+                    group='traffic',
+                    key=key,
+                    source_id=str(code),
+                    name='Speed anomaly score',
+                    device_class=None,
+                    native_unit_of_measurement=None,
+                    device_info=device_info,
+                    icon='mdi:chart-bell-curve',
+                ),
+            )
+
+            if score.started and self.event_bus is not None:
+                self.logger.debug(f'Traffic anomaly on segment {code}: score {score.score}')
+                self.event_bus.publish_nowait(TrafficAnomaly(
+                    entity_id='sensor.' + key,
+                    segment_code=code,
+                    score=score.score,
+                    avg_speed=feature.properties.data.avg_speed,
+                    baseline_speed=score.baseline_speed,
+                ))
@@ -0,0 +1,156 @@
+import base64
+import math
+from array import array
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any
+from zoneinfo import ZoneInfo
+
+TIMEZONE = ZoneInfo('Europe/Warsaw')
+BUCKET_MINUTES = 30
+BUCKETS_PER_DAY = 24 * 60 // BUCKET_MINUTES
+BUCKETS = 7 * BUCKETS_PER_DAY
+# Bucket counts stop growing here, so old weeks fade out and the baseline follows slow changes.
+MAX_SAMPLES = 60
+MIN_SAMPLES = 6
+MIN_STD = 1.0
+DEFAULT_THRESHOLD = 3.0
+
+
+def bucket_of(date_time: datetime) -> int:
+    local = date_time.astimezone(TIMEZONE)
+    return local.weekday() * BUCKETS_PER_DAY + (local.hour * 60 + local.minute) // BUCKET_MINUTES
+
+
+class SegmentBaseline:
+    """Streaming mean and variance of a segment's speed for every weekday and time-of-day bucket."""
+    __slots__ = ('counts', 'means', 'variances', 'last_date_time')
+
+    def __init__(self) -> None:
+        self.counts: array = array('H', bytes(2 * BUCKETS))
+        self.means: array = array('f', bytes(4 * BUCKETS))
+        self.variances: array = array('f', bytes(4 * BUCKETS))
+        self.last_date_time: datetime | None = None
+
+    def score(self, bucket: int, value: float) -> float | None:
+        if self.counts[bucket] < MIN_SAMPLES:
+            return None
+        return (value - self.means[bucket]) / max(math.sqrt(self.variances[bucket]), MIN_STD)
+
+    def add(self, bucket: int, value: float) -> None:
+        # With weight 1/n this is exactly Welford's running mean and population variance; once n is
+        # capped at MAX_SAMPLES it turns into an exponentially weighted one.
+        weight = 1 / min(self.counts[bucket] + 1, MAX_SAMPLES)
+        delta = value - self.means[bucket]
+        self.means[bucket] += weight * delta
+        self.variances[bucket] = (1 - weight) * (self.variances[bucket] + weight * delta * delta)
+        self.counts[bucket] = min(self.counts[bucket] + 1, MAX_SAMPLES)
+
+    def std(self, bucket: int) -> float | None:
+        return math.sqrt(self.variances[bucket]) if self.counts[bucket] > 1 else None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'counts': base64.b64encode(self.counts.tobytes()).decode('ascii'),
+            'means': base64.b64encode(self.means.tobytes()).decode('ascii'),
+            'variances': base64.b64encode(self.variances.tobytes()).decode('ascii'),
+            'last_date_time': self.last_date_time.isoformat() if self.last_date_time is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "SegmentBaseline":
+        baseline = SegmentBaseline()
+        counts, means, variances = array('H'), array('f'), array('f')
+        counts.frombytes(base64.b64decode(data['counts']))
+        means.frombytes(base64.b64decode(data['means']))
+        variances.frombytes(base64.b64decode(data['variances']))
+        if len(counts) == len(means) == len(variances) == BUCKETS:
+            baseline.counts, baseline.means, baseline.variances = counts, means, variances
+            if data.get('last_date_time'):
+                baseline.last_date_time = datetime.fromisoformat(data['last_date_time'])
+        return baseline
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class SpeedReading:
+    code: int
+    date_time: datetime
+    avg_speed: float
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class AnomalyScore:
+    code: int
+    score: float | None
+    baseline_speed: float | None
+    baseline_std: float | None
+    samples: int
+    is_anomaly: bool
+    started: bool
+
+
+class TrafficAnomalyDetector:
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD) -> None:
+        self.__baselines: dict[int, SegmentBaseline] = {}
+        self.__anomalous: set[int] = set()
+        self.__last_scores: dict[int, AnomalyScore] = {}
+        self.threshold: float = threshold
+        self.revision: int = 0
+
+    def __len__(self) -> int:
+        return len(self.__baselines)
+
+    def update(self, readings: list[SpeedReading]) -> dict[int, AnomalyScore]:
+        """Score every reading against its baseline, then fold it in; one pass per refresh."""
+        scores: dict[int, AnomalyScore] = {}
+        for reading in readings:
+            baseline = self.__baselines.get(reading.code)
+            if baseline is None:
+                baseline = self.__baselines[reading.code] = SegmentBaseline()
+
+            is_new = baseline.last_date_time is None or reading.date_time > baseline.last_date_time
+            last_score = self.__last_scores.get(reading.code)
+            if not is_new and last_score is not None:
+                # Upstream repeats its newest reading until it publishes the next one; scoring it again against
+                # a baseline that already contains it would pull the score towards zero.
+                scores[reading.code] = replace(last_score, started=False)
+                continue
+
+            bucket = bucket_of(reading.date_time)
+            score = baseline.score(bucket, reading.avg_speed)
+            is_anomaly = score is not None and abs(score) >= self.threshold
+            started = is_anomaly and reading.code not in self.__anomalous
+            if is_anomaly:
+                self.__anomalous.add(reading.code)
+            else:
+                self.__anomalous.discard(reading.code)
+
+            scores[reading.code] = self.__last_scores[reading.code] = AnomalyScore(
+                code=reading.code,
+                score=round(score, 2) if score is not None else None,
+                baseline_speed=round(baseline.means[bucket], 1) if baseline.counts[bucket] else None,
+                baseline_std=round(std, 2) if (std := baseline.std(bucket)) is not None else None,
+                samples=baseline.counts[bucket],
+                is_anomaly=is_anomaly,
+                started=started,
+            )
+
+            if is_new:
+                baseline.add(bucket, reading.avg_speed)
+                baseline.last_date_time = reading.date_time
+                self.revision += 1
+
+        return scores
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'bucket_minutes': BUCKET_MINUTES,
+            'segments': {str(code): baseline.as_dict() for code, baseline in self.__baselines.items()},
+        }
+
+    def restore(self, data: dict[str, Any] | None) -> None:
+        if not data or data.get('bucket_minutes') != BUCKET_MINUTES:
+            return
+
+        for code, baseline in data.get('segments', {}).items():
+            self.__baselines[int(code)] = SegmentBaseline.from_dict(baseline)
@@ -0,0 +1,76 @@
+import time
+from collections import deque
+from logging import Logger
+
+from custom_components.ktw_its.api.offload import BlockingTimer
+
+DEFAULT_BUDGET_MS = 50.0
+DEFAULT_WINDOW = 256
+WARNING_INTERVAL_SECONDS = 60.0
+
+
+class SectionStats:
+    __slots__ = ('durations', 'count', 'over_budget', 'max', 'last_warning')
+
+    def __init__(self, window: int) -> None:
+        self.durations: deque[float] = deque(maxlen=window)
+        self.count: int = 0
+        self.over_budget: int = 0
+        self.max: float = 0.0
+        self.last_warning: float | None = None
+
+    def as_dict(self) -> dict[str, float | int]:
+        ordered = sorted(self.durations)
+
+        def percentile(fraction: float) -> float:
+            if not ordered:
+                return 0.0
+            return round(ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000, 3)
+
+        return {
+            'count': self.count,
+            'over_budget': self.over_budget,
+            'last_ms': round(self.durations[-1] * 1000, 3) if self.durations else 0.0,
+            'max_ms': round(self.max * 1000, 3),
+            'rolling_max_ms': round(ordered[-1] * 1000, 3) if ordered else 0.0,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+        }
+
+
+class BlockingWatchdog:
+    """Times synchronous sections that run on the event loop and warns when one exceeds its budget."""
+
+    def __init__(self, logger: Logger, budget_ms: float = DEFAULT_BUDGET_MS, window: int = DEFAULT_WINDOW) -> None:
+        self.__logger: Logger = logger
+        self.__window: int = window
+        self.__sections: dict[str, SectionStats] = {}
+        self.budget_ms: float = budget_ms
+
+    def section(self, name: str) -> BlockingTimer:
+        return BlockingTimer(on_stop=lambda elapsed: self.record(name, elapsed))
+
+    def record(self, name: str, elapsed: float) -> None:
+        stats = self.__sections.get(name)
+        if stats is None:
+            stats = self.__sections[name] = SectionStats(window=self.__window)
+
+        stats.durations.append(elapsed)
+        stats.count += 1
+        stats.max = max(stats.max, elapsed)
+
+        if elapsed * 1000 <= self.budget_ms:
+            return
+
+        stats.over_budget += 1
+        now = time.monotonic()
+        if stats.last_warning is None or now - stats.last_warning >= WARNING_INTERVAL_SECONDS:
+            stats.last_warning = now
+            self.__logger.warning(
+                "%s blocked the event loop for %.1f ms (budget %.1f ms, %d times over budget so far)",
+                name, elapsed * 1000, self.budget_ms, stats.over_budget
+            )
+
+    def as_dict(self) -> dict[str, dict[str, float | int]]:
+        return {name: stats.as_dict() for name, stats in sorted(self.__sections.items())}
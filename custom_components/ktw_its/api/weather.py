@@ -1,6 +1,6 @@
 from collections.abc import Iterable
 from dataclasses import dataclass
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 from logging import Logger
 
 from marshmallow import fields, Schema, post_load, EXCLUDE
@@ -13,12 +13,18 @@ from homeassistant.const import (
     UnitOfPressure,
     UnitOfTemperature,
     UnitOfSpeed, )
+from custom_components.ktw_its.api.air_quality import AirQualityAggregator, AGGREGATES, POLLUTANTS
+from custom_components.ktw_its.api.cache import StaleWhileRevalidate, TtlCache, estimate_size
+from custom_components.ktw_its.api.clock import ClockInterface, SystemClock
+from custom_components.ktw_its.api.export import SnapshotExporter
 from custom_components.ktw_its.api.http_client import HttpClientInterface
+from custom_components.ktw_its.api.offload import run_cpu_bound
+from custom_components.ktw_its.api.watchdog import BlockingWatchdog
 from custom_components.ktw_its.dto import KtwItsSensorDto
 from custom_components.ktw_its.sensor import KtwItsSensorEntityDescription
 
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class Weather:
     date: datetime
     sunrise: datetime
@@ -70,23 +76,72 @@ class WeatherSchema(Schema):
         return Weather(**data)
 
 
+AGGREGATE_SENSORS: dict[str, tuple[SensorDeviceClass, str | None]] = {
+    'pm10': (SensorDeviceClass.PM10, CONCENTRATION_MICROGRAMS_PER_CUBIC_METER),
+    'pm2_5': (SensorDeviceClass.PM25, CONCENTRATION_MICROGRAMS_PER_CUBIC_METER),
+    'no2': (SensorDeviceClass.NITROGEN_DIOXIDE, CONCENTRATION_MICROGRAMS_PER_CUBIC_METER),
+    'so2': (SensorDeviceClass.SULPHUR_DIOXIDE, CONCENTRATION_MICROGRAMS_PER_CUBIC_METER),
+    'o3': (SensorDeviceClass.OZONE, CONCENTRATION_MICROGRAMS_PER_CUBIC_METER),
+    'co': (SensorDeviceClass.CO, CONCENTRATION_PARTS_PER_MILLION),
+    'aqi': (SensorDeviceClass.AQI, None),
+}
+
+WEATHER_KEY = 'weather'
+
+
 class WeatherApi:
-    def __init__(self, http_client: HttpClientInterface, logger: Logger) -> None:
+    def __init__(
+            self,
+            http_client: HttpClientInterface,
+            logger: Logger,
+            clock: ClockInterface | None = None,
+            watchdog: BlockingWatchdog | None = None,
+            revalidator: StaleWhileRevalidate | None = None
+    ) -> None:
         self.http_client: HttpClientInterface = http_client
         self.logger: Logger = logger
-        self.weather_data: dict[str, KtwItsSensorDto] = {}
-        self.weather_data_valid_to: datetime | None = None
+        self.clock: ClockInterface = clock or SystemClock()
+        self.watchdog: BlockingWatchdog = watchdog or BlockingWatchdog(logger=logger)
+        self.revalidator: StaleWhileRevalidate = revalidator or StaleWhileRevalidate(logger=logger)
+        self.air_quality: AirQualityAggregator = AirQualityAggregator()
+        self.exporter: SnapshotExporter | None = None
+        self.cache: TtlCache[str, dict[str, KtwItsSensorDto]] = TtlCache(
+            name='weather',
+            loader=self.__load_weather_data,
+            logger=logger,
+            clock=self.clock,
+            revalidator=self.revalidator
+        )
 
     async def fetch_data(self) -> dict[str, KtwItsSensorDto]:
-        if self.weather_data_valid_to is not None and self.weather_data_valid_to >= datetime.now(timezone.utc):
-            self.logger.debug("Weather data is still valid")
-            return self.weather_data
+        return await self.cache.get(WEATHER_KEY)
+
+    def diagnostics(self) -> dict:
+        cache = self.cache.as_dict()
+        valid_to = self.cache.valid_to(WEATHER_KEY)
+        return {
+            **cache,
+            'valid_to': valid_to.isoformat() if valid_to else None,
+            'estimated_bytes': cache['estimated_bytes'] + estimate_size(self.air_quality),
+        }
 
+    async def __load_weather_data(self, key: str) -> tuple[dict[str, KtwItsSensorDto], datetime]:
         weather_json = await self.http_client.make_request('https://its.katowice.eu/api/v1/weather/air')
-        weather = Weather.from_json(weather_json)
-        self.weather_data_valid_to = weather.date + timedelta(minutes=20)
+        parse = self.watchdog.section('weather.parse')
+        weather = await run_cpu_bound(len(weather_json), Weather.from_json, weather_json, timer=parse)
 
-        self.weather_data.update(
+        with self.watchdog.section('weather.build') as build:
+            weather_data = self.__build_weather_data(weather)
+            if self.exporter is not None:
+                self.exporter.add_weather(weather)
+        self.logger.debug(f"Weather refresh blocked the event loop for {parse.elapsed_ms + build.elapsed_ms:.1f} ms")
+
+        return weather_data, weather.date + timedelta(minutes=20)
+
+    def __build_weather_data(self, weather: Weather) -> dict[str, KtwItsSensorDto]:
+        weather_data: dict[str, KtwItsSensorDto] = {}
+        self.__update_air_quality_data(weather, weather_data)
+        weather_data.update(
             [
                 (
                     SensorDeviceClass.TEMPERATURE,
@@ -275,4 +330,21 @@ class WeatherApi:
             ]
         )
 
-        return self.weather_data
+        return weather_data
+
+    def __update_air_quality_data(self, weather: Weather, weather_data: dict[str, KtwItsSensorDto]) -> None:
+        self.air_quality.add(weather.date, {pollutant: getattr(weather, pollutant) for pollutant in POLLUTANTS})
+
+        values = self.air_quality.values()
+        for aggregate in AGGREGATES:
+            device_class, unit = AGGREGATE_SENSORS[aggregate.pollutant]
+            weather_data[aggregate.key] = KtwItsSensorDto(
+                state=values[aggregate.key],
+                entity_description=KtwItsSensorEntityDescription(
+                    group='weather',
+                    key=aggregate.key,
+                    name=aggregate.name,
+                    device_class=device_class,
+                    native_unit_of_measurement=unit,
+                ),
+            )
@@ -13,13 +13,16 @@ from homeassistant.core import callback
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import selector
 
-from custom_components.ktw_its.const import DOMAIN
+from custom_components.ktw_its.api.watchdog import DEFAULT_BUDGET_MS
+from custom_components.ktw_its.const import DOMAIN, DATA_HUB, CONF_DEVICE_TRACKERS, CONF_BLOCKING_BUDGET_MS, \
+    CONF_TRAFFIC_SEGMENTS, CONF_CAMERAS, CONF_EXPORT, CONF_MAX_STALENESS_SECONDS, CONF_FAVORITE_CAMERAS, CONF_ARCHIVE, \
+    CONF_ARCHIVE_RETENTION_HOURS, CONF_ARCHIVE_QUOTA_MB, DEFAULT_ARCHIVE_RETENTION_HOURS, DEFAULT_ARCHIVE_QUOTA_MB
 
 _LOGGER = logging.getLogger(__name__)
 
-CONF_DEVICE_TRACKERS = "device_trackers"
-
 STEP_USER_DATA_SCHEMA = vol.Schema({})
+# Only on the form when the source lists could be fetched.
+SOURCE_OPTIONS = (CONF_TRAFFIC_SEGMENTS, CONF_CAMERAS, CONF_FAVORITE_CAMERAS)
 
 
 class KtwItsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -42,19 +45,64 @@ class KtwItsOptionsFlow(OptionsFlow):
 
     async def async_step_init(self, user_input: dict[str, Any] | None = None) -> ConfigFlowResult:
         if user_input is not None:
-            print(user_input)
-            return self.async_create_entry(title="", data=user_input)
+            # Without the source pickers the saved selection must survive, not fall back to "all sources".
+            kept = {
+                key: self.config_entry.options[key]
+                for key in SOURCE_OPTIONS if key not in user_input and key in self.config_entry.options
+            }
+            return self.async_create_entry(title="", data={**kept, **user_input})
 
         schema = vol.Schema(
             {
+                **await self.__async_source_schema(),
                 vol.Optional(
-                    "device_trackers",
-                    default=self.config_entry.options.get("device_trackers"),
+                    CONF_DEVICE_TRACKERS,
+                    default=self.config_entry.options.get(CONF_DEVICE_TRACKERS),
                     msg="some message",
                     description="some description",
                 ): selector.EntitySelector(
                     selector.EntitySelectorConfig(domain=Platform.DEVICE_TRACKER, multiple=True),
-                )
+                ),
+                vol.Optional(
+                    CONF_BLOCKING_BUDGET_MS,
+                    default=self.config_entry.options.get(CONF_BLOCKING_BUDGET_MS, DEFAULT_BUDGET_MS),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=1, max=1000, step=1, unit_of_measurement="ms", mode=selector.NumberSelectorMode.BOX
+                    ),
+                ),
+                vol.Optional(
+                    CONF_MAX_STALENESS_SECONDS,
+                    default=self.config_entry.options.get(CONF_MAX_STALENESS_SECONDS, 0),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0, max=3600, step=1, unit_of_measurement="s", mode=selector.NumberSelectorMode.BOX
+                    ),
+                ),
+                vol.Optional(
+                    CONF_EXPORT,
+                    default=self.config_entry.options.get(CONF_EXPORT, False),
+                ): selector.BooleanSelector(),
+                vol.Optional(
+                    CONF_ARCHIVE,
+                    default=self.config_entry.options.get(CONF_ARCHIVE, False),
+                ): selector.BooleanSelector(),
+                vol.Optional(
+                    CONF_ARCHIVE_RETENTION_HOURS,
+                    default=self.config_entry.options.get(CONF_ARCHIVE_RETENTION_HOURS, DEFAULT_ARCHIVE_RETENTION_HOURS),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=1, max=720, step=1, unit_of_measurement="h", mode=selector.NumberSelectorMode.BOX
+                    ),
+                ),
+                vol.Optional(
+                    CONF_ARCHIVE_QUOTA_MB,
+                    default=self.config_entry.options.get(CONF_ARCHIVE_QUOTA_MB, DEFAULT_ARCHIVE_QUOTA_MB),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=16, max=65536, step=16, unit_of_measurement="MB", mode=selector.NumberSelectorMode.BOX
+                    ),
+                ),
             }
         )
 
@@ -64,6 +112,46 @@ class KtwItsOptionsFlow(OptionsFlow):
             last_step=True
         )
 
+    async def __async_source_schema(self) -> dict:
+        """Traffic segment and camera pickers; left out when the source lists cannot be fetched."""
+        hub = self.hass.data.get(DATA_HUB)
+        if hub is None:
+            return {}
+
+        try:
+            segments, cameras = await hub.async_fetch_sources()
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Could not fetch ITS traffic segments and cameras")
+            return {}
+
+        return {
+            vol.Optional(
+                CONF_TRAFFIC_SEGMENTS,
+                default=self.config_entry.options.get(CONF_TRAFFIC_SEGMENTS, []),
+            ): source_selector(segments),
+            vol.Optional(
+                CONF_CAMERAS,
+                default=self.config_entry.options.get(CONF_CAMERAS, []),
+            ): source_selector(cameras),
+            vol.Optional(
+                CONF_FAVORITE_CAMERAS,
+                default=self.config_entry.options.get(CONF_FAVORITE_CAMERAS, []),
+            ): source_selector(cameras),
+        }
+
+
+def source_selector(sources: dict[int, str]) -> selector.SelectSelector:
+    return selector.SelectSelector(
+        selector.SelectSelectorConfig(
+            options=[
+                selector.SelectOptionDict(value=str(source_id), label=label)
+                for source_id, label in sorted(sources.items(), key=lambda item: item[1])
+            ],
+            multiple=True,
+            mode=selector.SelectSelectorMode.DROPDOWN,
+        )
+    )
+
 
 
 class CannotConnect(HomeAssistantError):
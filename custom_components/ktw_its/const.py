@@ -5,6 +5,31 @@ from __future__ import annotations
 from typing import Final
 
 DOMAIN = "ktw_its"
+DATA_HUB = f"{DOMAIN}_hub"
+
+CONF_DEVICE_TRACKERS = "device_trackers"
+CONF_BLOCKING_BUDGET_MS = "blocking_budget_ms"
+CONF_TRAFFIC_SEGMENTS = "traffic_segments"
+CONF_CAMERAS = "cameras"
+CONF_FAVORITE_CAMERAS = "favorite_cameras"
+CONF_EXPORT = "export"
+CONF_MAX_STALENESS_SECONDS = "max_staleness_seconds"
+CONF_ARCHIVE = "archive"
+CONF_ARCHIVE_RETENTION_HOURS = "archive_retention_hours"
+CONF_ARCHIVE_QUOTA_MB = "archive_quota_mb"
+
+EXPORT_DIRECTORY = f"{DOMAIN}_export"
+ARCHIVE_DIRECTORY = f"{DOMAIN}_archive"
+DEFAULT_ARCHIVE_RETENTION_HOURS = 24
+DEFAULT_ARCHIVE_QUOTA_MB = 512
+
+SOURCE_WEATHER = "weather"
+SOURCE_TRAFFIC = "traffic"
+SOURCE_CAMERAS = "cameras"
+SOURCE_PARKING_ZONES = "parking_zones"
+
+# Formatted with a camera id; sent when viewing a camera moved the timestamps of its images.
+SIGNAL_CAMERA_IMAGES_UPDATED = f"{DOMAIN}_camera_images_updated_{{}}"
 
 WEATHER_DATA = "weather"
 TEMPERATURE_DATA = "temperature"
@@ -19,4 +44,3 @@ STATE_ATTR_UPDATE_DATE = "update_date"
 STATE_ATTR_COLOR = "color"
 STATE_ATTR_LONGITUDE = "longitude"
 STATE_ATTR_LATITUDE = "latitude"
-
@@ -1,35 +1,78 @@
+from __future__ import annotations
 
+from collections.abc import Awaitable, Callable
 from datetime import timedelta
 from logging import Logger
+from typing import TYPE_CHECKING
 
-from homeassistant.core import HomeAssistant, Event, EventStateChangedData, callback
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator,
 )
 
-from custom_components.ktw_its.api.api import KtwItsApi
-from custom_components.ktw_its.dto import KtwItsCameraImageDto, KtwItsSensorDto
+from custom_components.ktw_its.const import SOURCE_WEATHER, SOURCE_TRAFFIC, SOURCE_CAMERAS, SOURCE_PARKING_ZONES, \
+    SIGNAL_CAMERA_IMAGES_UPDATED
+
+if TYPE_CHECKING:
+    from custom_components.ktw_its.api.api import KtwItsApi
+    from custom_components.ktw_its.dto import KtwItsCameraImageDto, KtwItsSensorDto
+
+# Each source polls at its own pace; the API caches decide whether a tick actually goes upstream.
+UPDATE_INTERVALS: dict[str, timedelta] = {
+    SOURCE_WEATHER: timedelta(minutes=5),
+    SOURCE_TRAFFIC: timedelta(seconds=60),
+    SOURCE_CAMERAS: timedelta(seconds=60),
+    SOURCE_PARKING_ZONES: timedelta(minutes=60),
+}
 
 
 class KtwItsDataUpdateCoordinator(DataUpdateCoordinator):
-    def __init__(self, hass: HomeAssistant, api: KtwItsApi, logger: Logger) -> None:
+    """Polls one source; a refresh only runs that source's work and only notifies its entities."""
+
+    def __init__(
+            self,
+            hass: HomeAssistant,
+            source: str,
+            fetch: Callable[[], Awaitable[dict[str, KtwItsSensorDto | KtwItsCameraImageDto]]],
+            logger: Logger
+    ) -> None:
         super().__init__(
             hass=hass,
             logger=logger,
-            name="ITS Katowice",
-            update_interval=timedelta(seconds=60),
+            name=f"ITS Katowice {source}",
+            update_interval=UPDATE_INTERVALS[source],
         )
-        self.__api = api
-
-    async def fetch_data(self) -> dict[str, KtwItsSensorDto | KtwItsCameraImageDto]:
-        return await self.__api.fetch_data()
+        self.source: str = source
+        self.__fetch = fetch
 
     async def _async_update_data(self) -> dict:
-        return await self.__api.fetch_data(set(self.async_contexts()))
+        return await self.__fetch()
+
+
+class KtwItsCameraCoordinator(KtwItsDataUpdateCoordinator):
+    """Camera polling plus image views, which only notify the entities of the viewed camera."""
+
+    def __init__(self, hass: HomeAssistant, api: KtwItsApi, logger: Logger) -> None:
+        super().__init__(hass=hass, source=SOURCE_CAMERAS, fetch=api.fetch_camera_data, logger=logger)
+        self.__api = api
+        self.__pending_signals: set[int] = set()
 
     async def get_camera_image(self, camera_id: int, image_id: int) -> bytes | None:
-        return await self.__api.get_camera_image(camera_id, image_id)
+        # Compared on the API's live slots: after a camera list rebuild they are newer than self.data.
+        before = self.__api.camera_slots_state(camera_id)
+        image = await self.__api.get_camera_image(camera_id, image_id)
+        # Loading the camera's image list may have moved the timestamps of any of its slots.
+        if self.__api.camera_slots_state(camera_id) != before and camera_id not in self.__pending_signals:
+            # Views of the same camera that finish together share one notification.
+            self.__pending_signals.add(camera_id)
+            self.hass.loop.call_soon(self.__signal_camera_images_updated, camera_id)
+        return image
+
+    def camera_slot(self, camera_id: int, image_id: int) -> KtwItsCameraImageDto | None:
+        return self.__api.camera_slot(camera_id, image_id)
+
+    def __signal_camera_images_updated(self, camera_id: int) -> None:
+        self.__pending_signals.discard(camera_id)
+        async_dispatcher_send(self.hass, SIGNAL_CAMERA_IMAGES_UPDATED.format(camera_id))
 
-    @callback
-    def on_entity_state_change(self, event: Event[EventStateChangedData]) -> None:
-        self.__api.on_entity_state_change(event)
@@ -12,14 +12,16 @@ from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
 )
 
-from custom_components.ktw_its import KtwItsDataUpdateCoordinator
-from custom_components.ktw_its.const import DOMAIN
+from custom_components.ktw_its.coordinator import KtwItsDataUpdateCoordinator
+from custom_components.ktw_its.const import DOMAIN, SOURCE_PARKING_ZONES
 
 SCAN_INTERVAL = timedelta(seconds=10)
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
-    coordinator: KtwItsDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+    coordinator: KtwItsDataUpdateCoordinator | None = hass.data[DOMAIN][entry.entry_id].get(SOURCE_PARKING_ZONES)
+    if coordinator is None:
+        return
     entities = [KtwItsTrackerEntity(coordinator=coordinator)]
     async_add_entities(entities)
 
@@ -4,7 +4,7 @@ from homeassistant.const import (
 )
 from homeassistant.helpers.config_validation import TRIGGER_BASE_SCHEMA
 
-TRIGGER_TYPES = {"parking_zone_enter", "parking_zone_leave"}
+TRIGGER_TYPES = {"parking_zone_enter", "parking_zone_leave", "traffic_anomaly"}
 
 TRIGGER_SCHEMA = TRIGGER_BASE_SCHEMA.extend(
     {
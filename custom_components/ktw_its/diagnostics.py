@@ -0,0 +1,25 @@
+"""Diagnostics support for ITS Katowice."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from custom_components.ktw_its.const import DATA_HUB
+from custom_components.ktw_its.hub import KtwItsHub
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, config_entry: ConfigEntry) -> dict[str, Any]:
+    hub: KtwItsHub = hass.data[DATA_HUB]
+
+    return {
+        "options": dict(config_entry.options),
+        "event_loop_blocking": {
+            "budget_ms": hub.watchdog.budget_ms,
+            "sections": hub.watchdog.as_dict(),
+        },
+        "request_scheduler": hub.scheduler.as_dict(),
+        "sources": hub.sources_diagnostics(),
+    }
@@ -1,12 +1,17 @@
+from __future__ import annotations
+
 from dataclasses import dataclass
 from datetime import datetime
+from typing import TYPE_CHECKING
 
 from homeassistant.const import Platform
-from custom_components.ktw_its.image import KtwItsImageEntityDescription
-from custom_components.ktw_its.sensor import KtwItsSensorEntityDescription
+
+if TYPE_CHECKING:
+    from custom_components.ktw_its.image import KtwItsImageEntityDescription
+    from custom_components.ktw_its.sensor import KtwItsSensorEntityDescription
 
 
-@dataclass(frozen=False)
+@dataclass(frozen=False, slots=True)
 class KtwItsCameraImageDto:
     image_last_updated: datetime | None = None
     entity_description: KtwItsImageEntityDescription | None = None
@@ -14,9 +19,9 @@ class KtwItsCameraImageDto:
     platform: Platform = Platform.IMAGE
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class KtwItsSensorDto:
-    state: str | int | float | datetime
+    state: str | int | float | datetime | None
     entity_description: KtwItsSensorEntityDescription
     state_attributes: dict[str, str | float | datetime] | None = None
     platform: Platform = Platform.SENSOR
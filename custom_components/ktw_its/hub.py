@@ -0,0 +1,394 @@
+"""Polling hub shared by every ITS Katowice config entry."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from importlib import import_module
+from logging import Logger
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, CALLBACK_TYPE, callback, Event, EventStateChangedData
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
+
+from custom_components.ktw_its.api.air_quality import AirQualityAggregator
+from custom_components.ktw_its.api.api import KtwItsApi
+from custom_components.ktw_its.api.archive import FrameArchive
+from custom_components.ktw_its.api.cache import StaleWhileRevalidate
+from custom_components.ktw_its.api.camera import CameraApi
+from custom_components.ktw_its.api.congestion_map import CongestionMap
+from custom_components.ktw_its.api.export import SnapshotExporter
+from custom_components.ktw_its.api.http_client import HttpClient
+from custom_components.ktw_its.api.messenger import EventBus, ItsEvent, EVENT_TYPE
+from custom_components.ktw_its.api.prewarm import CameraPrewarmer
+from custom_components.ktw_its.api.scheduler import RequestScheduler, ScheduledHttpClient
+from custom_components.ktw_its.api.traffic import TrafficApi
+from custom_components.ktw_its.api.traffic_anomaly import TrafficAnomalyDetector
+from custom_components.ktw_its.api.watchdog import BlockingWatchdog, DEFAULT_BUDGET_MS
+from custom_components.ktw_its.api.weather import WeatherApi
+from custom_components.ktw_its.const import DOMAIN, DATA_HUB, CONF_DEVICE_TRACKERS, CONF_BLOCKING_BUDGET_MS, \
+    CONF_TRAFFIC_SEGMENTS, CONF_CAMERAS, CONF_EXPORT, EXPORT_DIRECTORY, CONF_ARCHIVE, CONF_ARCHIVE_RETENTION_HOURS, \
+    CONF_ARCHIVE_QUOTA_MB, ARCHIVE_DIRECTORY, DEFAULT_ARCHIVE_RETENTION_HOURS, DEFAULT_ARCHIVE_QUOTA_MB, \
+    CONF_MAX_STALENESS_SECONDS, CONF_FAVORITE_CAMERAS, SOURCE_WEATHER, SOURCE_TRAFFIC, SOURCE_CAMERAS, \
+    SOURCE_PARKING_ZONES
+from custom_components.ktw_its.coordinator import KtwItsDataUpdateCoordinator, KtwItsCameraCoordinator, \
+    UPDATE_INTERVALS
+
+SELECTION_SOURCES = (SOURCE_TRAFFIC, SOURCE_CAMERAS)
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY_SECONDS = 10
+# Each store is written at most this often while running, sparing SD cards; unloading always saves.
+STORAGE_MIN_SAVE_INTERVAL_SECONDS = 15 * 60
+# Zone transitions and anomalies waiting to be fired on the Home Assistant bus; more are dropped and counted.
+EVENT_QUEUE_SIZE = 1024
+
+
+def selection(values: list[str] | None) -> set[int] | None:
+    return {int(value) for value in values} if values else None
+
+
+def union(selections) -> set[int] | None:
+    result: set[int] = set()
+    for selected in selections:
+        if selected is None:
+            return None
+        result |= selected
+    return result
+
+
+class KtwItsHub:
+    """Owns the HTTP client, the API objects and one coordinator per source.
+
+    Upstream requests and parsing happen once per hass instance; config entries only subscribe.
+    """
+
+    def __init__(self, hass: HomeAssistant, logger: Logger) -> None:
+        self.__hass: HomeAssistant = hass
+        self.__logger: Logger = logger
+        self.__http_client: HttpClient = HttpClient(logger=logger)
+        self.__scheduler: RequestScheduler = RequestScheduler(logger=logger)
+        # Every API goes through the shared request budget.
+        self.__scheduled_client: ScheduledHttpClient = ScheduledHttpClient(
+            http_client=self.__http_client, scheduler=self.__scheduler
+        )
+        self.__watchdog: BlockingWatchdog = BlockingWatchdog(logger=logger)
+        self.__revalidator: StaleWhileRevalidate = StaleWhileRevalidate(logger=logger)
+        self.__event_bus: EventBus = EventBus(
+            logger=logger, max_queue_size=EVENT_QUEUE_SIZE, create_task=hass.async_create_background_task
+        )
+        self.__event_bus.subscribe(ItsEvent, self.__fire_event)
+        self.__weather_api: WeatherApi = WeatherApi(
+            http_client=self.__scheduled_client, logger=logger, watchdog=self.__watchdog, revalidator=self.__revalidator
+        )
+        self.__traffic_api: TrafficApi = TrafficApi(
+            http_client=self.__scheduled_client,
+            logger=logger,
+            watchdog=self.__watchdog,
+            event_bus=self.__event_bus,
+            revalidator=self.__revalidator
+        )
+        self.__camera_api: CameraApi = CameraApi(
+            http_client=self.__scheduled_client, logger=logger, watchdog=self.__watchdog, revalidator=self.__revalidator
+        )
+        self.__api: KtwItsApi = KtwItsApi(
+            weather_api=self.__weather_api,
+            traffic_api=self.__traffic_api,
+            camera_api=self.__camera_api,
+        )
+        self.__prewarmer: CameraPrewarmer = CameraPrewarmer(
+            camera_api=self.__camera_api, logger=logger, create_task=hass.async_create_background_task
+        )
+        self.__coordinators: dict[str, KtwItsDataUpdateCoordinator] = {
+            SOURCE_WEATHER: KtwItsDataUpdateCoordinator(
+                hass=hass, source=SOURCE_WEATHER, fetch=self.__api.fetch_weather_data, logger=logger
+            ),
+            SOURCE_TRAFFIC: KtwItsDataUpdateCoordinator(
+                hass=hass, source=SOURCE_TRAFFIC, fetch=self.__api.fetch_traffic_data, logger=logger
+            ),
+            SOURCE_CAMERAS: KtwItsCameraCoordinator(hass=hass, api=self.__api, logger=logger),
+        }
+        # Rolling state that has to survive restarts, saved whenever its revision moves.
+        self.__stores: dict[str, tuple[Store, AirQualityAggregator | TrafficAnomalyDetector]] = {
+            "air_quality": (
+                Store(hass, STORAGE_VERSION, f"{DOMAIN}.air_quality"), self.__weather_api.air_quality
+            ),
+            "traffic_baselines": (
+                Store(hass, STORAGE_VERSION, f"{DOMAIN}.traffic_baselines"), self.__traffic_api.anomaly_detector
+            ),
+        }
+        self.__saved_revisions: dict[str, int] = {}
+        self.__pending_saves: set[str] = set()
+        self.__next_saves: dict[str, float] = {}
+        self.__unsub_coordinator_listeners: list[CALLBACK_TYPE] = []
+        self.__restored: bool = False
+        # Blocking budget in ms and maximum staleness in seconds, per entry.
+        self.__tunings: dict[str, tuple[float, float]] = {}
+        self.__selections: dict[str, tuple[set[int] | None, set[int] | None]] = {}
+        self.__applied_selection: tuple[set[int] | None, set[int] | None] = (None, None)
+        self.__export_entries: set[str] = set()
+        self.__favorite_cameras: dict[str, set[int]] = {}
+        self.__exporter: SnapshotExporter | None = None
+        # Retention, quota and cameras (None for all) per entry with archiving enabled; the most generous apply.
+        self.__archive_entries: dict[str, tuple[timedelta, int, set[int] | None]] = {}
+        self.__archive: FrameArchive | None = None
+        self.__lock: asyncio.Lock = asyncio.Lock()
+
+    @property
+    def coordinators(self) -> dict[str, KtwItsDataUpdateCoordinator]:
+        return self.__coordinators
+
+    @property
+    def congestion_map(self) -> CongestionMap:
+        return self.__traffic_api.congestion_map
+
+    @property
+    def archive(self) -> FrameArchive | None:
+        return self.__archive
+
+    @property
+    def watchdog(self) -> BlockingWatchdog:
+        return self.__watchdog
+
+    @property
+    def scheduler(self) -> RequestScheduler:
+        return self.__scheduler
+
+    @classmethod
+    def async_get(cls, hass: HomeAssistant, logger: Logger) -> KtwItsHub:
+        if DATA_HUB not in hass.data:
+            hass.data[DATA_HUB] = KtwItsHub(hass=hass, logger=logger)
+        return hass.data[DATA_HUB]
+
+    async def async_subscribe(self, config_entry: ConfigEntry) -> dict[str, KtwItsDataUpdateCoordinator]:
+        async with self.__lock:
+            self.__tunings[config_entry.entry_id] = (
+                config_entry.options.get(CONF_BLOCKING_BUDGET_MS, DEFAULT_BUDGET_MS),
+                config_entry.options.get(CONF_MAX_STALENESS_SECONDS, 0),
+            )
+            self.__apply_tunings()
+
+            if config_entry.options.get(CONF_DEVICE_TRACKERS) and not self.__api.has_parking_zones:
+                await self.__async_enable_parking_zones()
+
+            favorites = selection(config_entry.options.get(CONF_FAVORITE_CAMERAS)) or set()
+            cameras = selection(config_entry.options.get(CONF_CAMERAS))
+            self.__selections[config_entry.entry_id] = (
+                selection(config_entry.options.get(CONF_TRAFFIC_SEGMENTS)),
+                # Favorites are always fetched, so list rebuilds never drop their pre-warmed images.
+                cameras | favorites if cameras is not None else None,
+            )
+            selection_changed = self.__apply_selection()
+
+            if config_entry.options.get(CONF_EXPORT):
+                self.__export_entries.add(config_entry.entry_id)
+            else:
+                self.__export_entries.discard(config_entry.entry_id)
+            await self.__async_apply_export()
+
+            if config_entry.options.get(CONF_ARCHIVE):
+                retention_hours = config_entry.options.get(CONF_ARCHIVE_RETENTION_HOURS, DEFAULT_ARCHIVE_RETENTION_HOURS)
+                quota_mb = config_entry.options.get(CONF_ARCHIVE_QUOTA_MB, DEFAULT_ARCHIVE_QUOTA_MB)
+                self.__archive_entries[config_entry.entry_id] = (
+                    timedelta(hours=retention_hours), int(quota_mb) * 1024 * 1024,
+                    self.__selections[config_entry.entry_id][1]
+                )
+            else:
+                self.__archive_entries.pop(config_entry.entry_id, None)
+            await self.__async_apply_archive()
+
+            self.__favorite_cameras[config_entry.entry_id] = favorites
+            self.__apply_prewarm()
+
+            if not self.__restored:
+                await self.__async_restore()
+            # A new selection only changes what traffic and cameras return; weather and zones keep polling.
+            coordinators = [
+                coordinator for coordinator in self.__coordinators.values()
+                if coordinator.data is None or (selection_changed and coordinator.source in SELECTION_SOURCES)
+            ]
+
+            await asyncio.gather(*(coordinator.async_refresh() for coordinator in coordinators))
+            failed = next((coordinator for coordinator in coordinators if not coordinator.last_update_success), None)
+            if failed is not None:
+                self.__selections.pop(config_entry.entry_id)
+                self.__apply_selection()
+                self.__export_entries.discard(config_entry.entry_id)
+                await self.__async_apply_export()
+                self.__archive_entries.pop(config_entry.entry_id, None)
+                await self.__async_apply_archive()
+                self.__favorite_cameras.pop(config_entry.entry_id)
+                self.__apply_prewarm()
+                self.__tunings.pop(config_entry.entry_id)
+                self.__apply_tunings()
+                raise ConfigEntryNotReady from failed.last_exception
+
+        return self.__coordinators
+
+    async def async_unsubscribe(self, entry_id: str) -> None:
+        async with self.__lock:
+            self.__selections.pop(entry_id, None)
+            self.__export_entries.discard(entry_id)
+            await self.__async_apply_export()
+            self.__archive_entries.pop(entry_id, None)
+            await self.__async_apply_archive()
+            self.__favorite_cameras.pop(entry_id, None)
+            self.__apply_prewarm()
+            self.__tunings.pop(entry_id, None)
+            self.__apply_tunings()
+            if self.__selections:
+                self.__apply_selection()
+                return
+
+            self.__logger.debug("Last config entry unloaded, shutting down the hub")
+            self.__hass.data.pop(DATA_HUB, None)
+            for unsub_coordinator_listener in self.__unsub_coordinator_listeners:
+                unsub_coordinator_listener()
+            for store, state in self.__stores.values():
+                await store.async_save(state.as_dict())
+            await self.__prewarmer.stop()
+            await self.__event_bus.stop()
+            for coordinator in self.__coordinators.values():
+                await coordinator.async_shutdown()
+            await self.__revalidator.close()
+            await self.__http_client.close()
+
+    @callback
+    def on_entity_state_change(self, event: Event[EventStateChangedData]) -> None:
+        self.__api.on_entity_state_change(event)
+
+    def sources_diagnostics(self) -> dict:
+        return {
+            **self.__api.diagnostics(),
+            'prewarmed_cameras': sorted(self.__prewarmer.camera_ids),
+            'archive': self.__archive.diagnostics() if self.__archive is not None else None,
+            'events': self.__event_bus.diagnostics(),
+        }
+
+    async def async_fetch_sources(self) -> tuple[dict[int, str], dict[int, str]]:
+        return await self.__api.fetch_sources()
+
+    @callback
+    def __fire_event(self, message: ItsEvent) -> None:
+        self.__hass.bus.async_fire(EVENT_TYPE, message.event_data())
+
+    def __apply_selection(self) -> bool:
+        """Fetch the union of what subscribed entries selected; an entry without a selection wants everything."""
+        segment_codes = union(segments for segments, _ in self.__selections.values())
+        camera_ids = union(cameras for _, cameras in self.__selections.values())
+        changed = (segment_codes, camera_ids) != self.__applied_selection
+        self.__applied_selection = (segment_codes, camera_ids)
+        self.__api.set_selection(segment_codes, camera_ids)
+
+        return changed
+
+    def __apply_tunings(self) -> None:
+        """The most lenient blocking budget and the strictest staleness limit of all entries apply."""
+        if not self.__tunings:
+            return
+        self.__watchdog.budget_ms = max(budget_ms for budget_ms, _ in self.__tunings.values())
+        self.__revalidator.max_staleness = timedelta(
+            seconds=min(max_staleness for _, max_staleness in self.__tunings.values())
+        )
+
+    @callback
+    def __apply_prewarm(self) -> None:
+        """Pre-warm the favorite cameras, which stay pinned in memory, and the archived ones."""
+        favorites = set().union(*self.__favorite_cameras.values())
+        archived = union(cameras for _, _, cameras in self.__archive_entries.values())
+        if archived is None:
+            archived = self.__camera_api.camera_ids
+        self.__camera_api.pin_cameras(favorites)
+        self.__camera_api.set_archived_cameras(archived)
+        self.__prewarmer.set_cameras(favorites | archived)
+
+    async def __async_apply_export(self) -> None:
+        """Run the snapshot exporter while at least one subscribed entry has export enabled."""
+        if self.__export_entries and self.__exporter is None:
+            self.__exporter = SnapshotExporter(directory=self.__hass.config.path(EXPORT_DIRECTORY), logger=self.__logger)
+            self.__exporter.start()
+        elif not self.__export_entries and self.__exporter is not None:
+            await self.__exporter.stop()
+            self.__exporter = None
+
+        self.__weather_api.exporter = self.__exporter
+        self.__traffic_api.exporter = self.__exporter
+
+    async def __async_apply_archive(self) -> None:
+        """Run the frame archive while at least one subscribed entry has archiving enabled."""
+        if self.__archive_entries and self.__archive is None:
+            self.__archive = FrameArchive(directory=self.__hass.config.path(ARCHIVE_DIRECTORY), logger=self.__logger)
+            self.__archive.start()
+        elif not self.__archive_entries and self.__archive is not None:
+            await self.__archive.stop()
+            self.__archive = None
+
+        if self.__archive is not None:
+            self.__archive.retention = max(retention for retention, _, _ in self.__archive_entries.values())
+            self.__archive.quota_bytes = max(quota_bytes for _, quota_bytes, _ in self.__archive_entries.values())
+        self.__camera_api.archive = self.__archive
+
+    async def __async_restore(self) -> None:
+        for name, (store, state) in self.__stores.items():
+            state.restore(await store.async_load())
+            self.__saved_revisions[name] = state.revision
+        # Only weather and traffic refreshes move the stored state.
+        for source in (SOURCE_WEATHER, SOURCE_TRAFFIC):
+            self.__unsub_coordinator_listeners.append(
+                self.__coordinators[source].async_add_listener(self.__on_coordinator_update)
+            )
+        # Archiving every camera follows the camera list.
+        self.__unsub_coordinator_listeners.append(
+            self.__coordinators[SOURCE_CAMERAS].async_add_listener(self.__apply_prewarm)
+        )
+        self.__restored = True
+
+    @callback
+    def __on_coordinator_update(self) -> None:
+        for name, (store, state) in self.__stores.items():
+            if state.revision != self.__saved_revisions.get(name) and name not in self.__pending_saves:
+                self.__pending_saves.add(name)
+                delay = max(STORAGE_SAVE_DELAY_SECONDS, self.__next_saves.get(name, 0.0) - time.monotonic())
+                store.async_delay_save(partial(self.__store_data, name), delay)
+
+    def __store_data(self, name: str) -> dict:
+        """Snapshot a state for its delayed save; changes made until the write are included."""
+        _, state = self.__stores[name]
+        self.__pending_saves.discard(name)
+        self.__saved_revisions[name] = state.revision
+        self.__next_saves[name] = time.monotonic() + STORAGE_MIN_SAVE_INTERVAL_SECONDS
+        return state.as_dict()
+
+    async def __async_enable_parking_zones(self) -> None:
+        # Parking zones (and shapely behind them) are only needed for device tracking.
+        parking_zones = await self.__hass.async_add_import_executor_job(
+            import_module, "custom_components.ktw_its.api.parking_zones"
+        )
+        parking_zones_api = parking_zones.ParkingZonesApi(
+            http_client=self.__scheduled_client,
+            repository=parking_zones.ParkingZoneRepository(logger=self.__logger, watchdog=self.__watchdog),
+            logger=self.__logger,
+            event_bus=self.__event_bus,
+            watchdog=self.__watchdog,
+            revalidator=self.__revalidator
+        )
+        # The first load happens in the coordinator refresh of async_subscribe, which turns failures into
+        # ConfigEntryNotReady.
+        self.__api.set_parking_zones_api(parking_zones_api)
+
+        coordinator = KtwItsDataUpdateCoordinator(
+            hass=self.__hass, source=SOURCE_PARKING_ZONES, fetch=self.__api.fetch_parking_zones_data, logger=self.__logger
+        )
+        self.__coordinators[SOURCE_PARKING_ZONES] = coordinator
+        # Coordinators only poll while entities listen, and zones have none; refresh them on an explicit schedule.
+        self.__unsub_coordinator_listeners.append(
+            async_track_time_interval(
+                self.__hass, self.__async_refresh_parking_zones, UPDATE_INTERVALS[SOURCE_PARKING_ZONES]
+            )
+        )
+
+    async def __async_refresh_parking_zones(self, _now: datetime) -> None:
+        await self.__coordinators[SOURCE_PARKING_ZONES].async_refresh()
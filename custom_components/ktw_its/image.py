@@ -10,26 +10,38 @@ from homeassistant.components.image import (
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.device_registry import DeviceInfo, DeviceEntryType
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from custom_components.ktw_its.const import DOMAIN, ATTRIBUTION, STATE_ATTR_UPDATE_DATE, STATE_ATTR_COLOR, \
-    STATE_ATTR_LONGITUDE, STATE_ATTR_LATITUDE
+from custom_components.ktw_its.api.congestion_map import CongestionMap
+from custom_components.ktw_its.coordinator import KtwItsCameraCoordinator, KtwItsDataUpdateCoordinator
+
+from custom_components.ktw_its.const import DOMAIN, DATA_HUB, DEFAULT_NAME, ATTRIBUTION, STATE_ATTR_UPDATE_DATE, \
+    STATE_ATTR_COLOR, STATE_ATTR_LONGITUDE, STATE_ATTR_LATITUDE, CONF_CAMERAS, SOURCE_CAMERAS, SOURCE_TRAFFIC, \
+    SIGNAL_CAMERA_IMAGES_UPDATED
 
 SCAN_INTERVAL = timedelta(seconds=60)
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
-
-    from custom_components.ktw_its import KtwItsDataUpdateCoordinator
-    coordinator: KtwItsDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
-    api_data = await coordinator.fetch_data()
+    coordinator: KtwItsCameraCoordinator = hass.data[DOMAIN][entry.entry_id][SOURCE_CAMERAS]
+    api_data = coordinator.data
+    cameras = entry.options.get(CONF_CAMERAS)
     entities = [KtwItsImageEntity(
         coordinator=coordinator,
         entity_description=dto.entity_description,
         hass=hass
-    ) for dto in api_data.values() if dto.platform == Platform.IMAGE]
+    ) for dto in api_data.values() if dto.platform == Platform.IMAGE and (
+        not cameras or str(dto.entity_description.camera_id) in cameras
+    )]
+    entities.append(KtwItsCongestionMapEntity(
+        hass=hass,
+        coordinator=hass.data[DOMAIN][entry.entry_id][SOURCE_TRAFFIC],
+        congestion_map=hass.data[DATA_HUB].congestion_map,
+        entry_id=entry.entry_id
+    ))
     async_add_entities(entities)
 
 
@@ -48,7 +60,7 @@ class KtwItsImageEntity(CoordinatorEntity, ImageEntity):
     def __init__(
             self,
             hass: HomeAssistant,
-            coordinator: KtwItsDataUpdateCoordinator,
+            coordinator: KtwItsCameraCoordinator,
             entity_description: KtwItsImageEntityDescription
     ) -> None:
         super().__init__(coordinator, context=entity_description.group)
@@ -70,17 +82,79 @@ class KtwItsImageEntity(CoordinatorEntity, ImageEntity):
     def extra_state_attributes(self) -> dict[str, str | float | datetime] | None:
         return self.__state_attributes
 
+    @property
+    def available(self) -> bool:
+        # Cameras that go offline upstream are no longer in the data; show them as unavailable.
+        return super().available and self.entity_description.key in self.coordinator.data
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, SIGNAL_CAMERA_IMAGES_UPDATED.format(self.__camera_id), self.__handle_camera_images_update
+            )
+        )
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        dto = self.coordinator.data.get(self.entity_description.key)
+        if dto is not None:
+            self._attr_image_last_updated = dto.image_last_updated
+            self.__state_attributes = dto.state_attributes
+        self.async_write_ha_state()
+
+    @callback
+    def __handle_camera_images_update(self) -> None:
+        # Read the live slot; the coordinator data may still hold the DTOs of an older camera list.
+        dto = self.__coordinator.camera_slot(self.__camera_id, self.__image_id)
+        if dto is not None:
+            self._attr_image_last_updated = dto.image_last_updated
+            self.__state_attributes = dto.state_attributes
+            self.async_write_ha_state()
+
+    async def async_image(self) -> bytes | None:
+        return await self.__coordinator.get_camera_image(self.__camera_id, self.__image_id)
+
+
+class KtwItsCongestionMapEntity(CoordinatorEntity, ImageEntity):
+    """Traffic segments colored by congestion; the PNG is rendered by the traffic refresh, only on change."""
+
+    _attr_attribution = ATTRIBUTION
+    _attr_has_entity_name = True
+    _attr_content_type = "image/png"
+    _attr_name = "Congestion map"
+    _attr_icon = "mdi:map-marker-path"
+
+    def __init__(
+            self,
+            hass: HomeAssistant,
+            coordinator: KtwItsDataUpdateCoordinator,
+            congestion_map: CongestionMap,
+            entry_id: str
+    ) -> None:
+        super().__init__(coordinator, context='traffic')
+        ImageEntity.__init__(self, hass=hass)
+        # Every entry shares the hub's map but owns its entity.
+        self._attr_unique_id = f"{DOMAIN}_{entry_id}_congestion_map"
+        self._attr_device_info = DeviceInfo(
+            entry_type=DeviceEntryType.SERVICE,
+            identifiers={(DOMAIN, 'congestion_map')},
+            manufacturer=DEFAULT_NAME,
+            name='Traffic congestion map',
+            configuration_url='https://its.katowice.eu',
+        )
+        self.__congestion_map = congestion_map
+        self._attr_image_last_updated = congestion_map.rendered_at
+
     @callback
     def _handle_coordinator_update(self) -> None:
-        if self.coordinator.data[self.entity_description.key]:
-            self._attr_image_last_updated = self.coordinator.data[self.entity_description.key].image_last_updated
-            self.__state_attributes = self.coordinator.data[self.entity_description.key].state_attributes
+        # Refreshes that did not change any color or speed leave the timestamp, and so the state, untouched.
+        if self.__congestion_map.rendered_at != self._attr_image_last_updated:
+            self._attr_image_last_updated = self.__congestion_map.rendered_at
             self.async_write_ha_state()
 
     async def async_image(self) -> bytes | None:
-        image = await self.__coordinator.get_camera_image(self.__camera_id, self.__image_id)
-        await self.coordinator.async_request_refresh()
-        return image
+        return self.__congestion_map.png
 
 
 @dataclass(frozen=True, kw_only=True)
@@ -20,20 +20,28 @@ from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator,
 )
 
+from custom_components.ktw_its.coordinator import KtwItsDataUpdateCoordinator
+
 from custom_components.ktw_its.const import DOMAIN, ATTRIBUTION, STATE_ATTR_UPDATE_DATE, STATE_ATTR_COLOR, \
-    STATE_ATTR_LONGITUDE, STATE_ATTR_LATITUDE
+    STATE_ATTR_LONGITUDE, STATE_ATTR_LATITUDE, CONF_TRAFFIC_SEGMENTS, SOURCE_WEATHER, SOURCE_TRAFFIC
 
 SCAN_INTERVAL = timedelta(seconds=60)
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
-    from custom_components.ktw_its import KtwItsDataUpdateCoordinator
-    coordinator: KtwItsDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
-    api_data = await coordinator.fetch_data()
-    entities = [
-        KtwItsSensorEntity(coordinator=coordinator, entity_description=dto.entity_description)
-        for dto in api_data.values() if dto.platform == Platform.SENSOR
-    ]
+    coordinators: dict[str, KtwItsDataUpdateCoordinator] = hass.data[DOMAIN][entry.entry_id]
+    # The shared hub fetches what any entry selected; each entry only materializes its own selection.
+    segments = entry.options.get(CONF_TRAFFIC_SEGMENTS)
+    entities = []
+    for source in (SOURCE_WEATHER, SOURCE_TRAFFIC):
+        coordinator = coordinators[source]
+        entities.extend(
+            KtwItsSensorEntity(coordinator=coordinator, entity_description=dto.entity_description)
+            for dto in coordinator.data.values() if dto.platform == Platform.SENSOR and (
+                not segments or dto.entity_description.group != 'traffic'
+                or dto.entity_description.source_id in segments
+            )
+        )
     async_add_entities(entities)
 
 
@@ -71,18 +79,25 @@ class KtwItsSensorEntity(CoordinatorEntity, SensorEntity):
     def icon(self) -> str | None:
         return self._icon
 
+    @property
+    def available(self) -> bool:
+        # Segments that disappear upstream are no longer in the data; show them as unavailable.
+        return super().available and self.entity_description.key in self.coordinator.data
+
     @callback
     def _handle_coordinator_update(self) -> None:
-        if self.coordinator.data[self.entity_description.key]:
-            self._attr_native_value = self.coordinator.data[self.entity_description.key].state
-            self._state_attributes = self.coordinator.data[self.entity_description.key].state_attributes
-            self.async_write_ha_state()
+        dto = self.coordinator.data.get(self.entity_description.key)
+        if dto is not None:
+            self._attr_native_value = dto.state
+            self._state_attributes = dto.state_attributes
+        self.async_write_ha_state()
 
 
 @dataclass(frozen=True, kw_only=True)
 class KtwItsSensorEntityDescription(SensorEntityDescription):
     group: str
     key: str
+    source_id: str | None = None
     device_class: SensorDeviceClass | None = None
     native_unit_of_measurement: str | None = None
     state_class: SensorStateClass | str | None = SensorStateClass.MEASUREMENT
@@ -0,0 +1,53 @@
+"""Timelapse of archived camera frames, streamed as MJPEG."""
+
+from __future__ import annotations
+
+import math
+from datetime import timedelta
+from http import HTTPStatus
+
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.util import dt as dt_util
+
+from custom_components.ktw_its.api.archive import MJPEG_BOUNDARY
+from custom_components.ktw_its.const import DOMAIN, DATA_HUB
+
+DEFAULT_HOURS = 1.0
+MAX_HOURS = 24 * 30.0
+DEFAULT_FPS = 10.0
+MAX_FPS = 30.0
+MAX_FRAMES = 1800
+
+
+class KtwItsTimelapseView(HomeAssistantView):
+    """GET /api/ktw_its/timelapse/<camera_id>/<image_id>?hours=1&fps=10, usable as an <img> source."""
+
+    url = f"/api/{DOMAIN}/timelapse/{{camera_id:\\d+}}/{{image_id:\\d+}}"
+    name = f"api:{DOMAIN}:timelapse"
+
+    async def get(self, request: web.Request, camera_id: str, image_id: str) -> web.StreamResponse:
+        hub = request.app["hass"].data.get(DATA_HUB)
+        archive = hub.archive if hub is not None else None
+        if archive is None:
+            return self.json_message("Camera frame archive is not enabled", HTTPStatus.NOT_FOUND)
+
+        try:
+            hours = float(request.query.get("hours", DEFAULT_HOURS))
+            fps = float(request.query.get("fps", DEFAULT_FPS))
+        except ValueError:
+            return self.json_message("hours and fps must be numbers", HTTPStatus.BAD_REQUEST)
+        if not (math.isfinite(hours) and math.isfinite(fps) and 0 < hours <= MAX_HOURS and 0 < fps <= MAX_FPS):
+            return self.json_message(
+                f"hours must be in (0, {MAX_HOURS:g}] and fps in (0, {MAX_FPS:g}]", HTTPStatus.BAD_REQUEST
+            )
+
+        end = dt_util.utcnow()
+        response = web.StreamResponse()
+        response.content_type = f"multipart/x-mixed-replace;boundary={MJPEG_BOUNDARY}"
+        await response.prepare(request)
+        async for part in archive.timelapse(
+                int(camera_id), int(image_id), end - timedelta(hours=hours), end, fps, MAX_FRAMES
+        ):
+            await response.write(part)
+        return response
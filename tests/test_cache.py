@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from custom_components.ktw_its.api.cache import TtlCache
+from custom_components.ktw_its.api.clock import SimulatedClock
+
+LOGGER = logging.getLogger(__name__)
+VALID_TO = datetime(2100, 1, 1, tzinfo=timezone.utc)
+
+
+def test_invalidate_discards_only_the_invalidated_key_s_load() -> None:
+    async def scenario() -> None:
+        release = asyncio.Event()
+        loads: list[str] = []
+
+        async def loader(key: str) -> tuple[str, datetime]:
+            loads.append(key)
+            await release.wait()
+            return f'{key}-{len(loads)}', VALID_TO
+
+        cache: TtlCache[str, str] = TtlCache('test', loader, LOGGER)
+        first = asyncio.ensure_future(cache.get('first'))
+        second = asyncio.ensure_future(cache.get('second'))
+        await asyncio.sleep(0)
+
+        cache.invalidate('first')
+        release.set()
+        await asyncio.gather(first, second)
+
+        # The other key's load was not affected by the invalidation and is served from the cache.
+        assert 'second' in cache
+        assert 'first' not in cache
+        assert await cache.get('second') == second.result()
+        assert loads == ['first', 'second']
+
+    asyncio.run(scenario())
+
+
+def test_read_after_invalidate_does_not_join_the_stale_load() -> None:
+    async def scenario() -> None:
+        release = asyncio.Event()
+        calls = 0
+
+        async def loader(key: str) -> tuple[str, datetime]:
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                await release.wait()
+                return 'old', VALID_TO
+            return 'new', VALID_TO
+
+        cache: TtlCache[str, str] = TtlCache('test', loader, LOGGER)
+        stale = asyncio.ensure_future(cache.get('key'))
+        await asyncio.sleep(0)
+
+        cache.invalidate('key')
+        assert await cache.get('key') == 'new'
+        release.set()
+        assert await stale == 'old'
+        assert await cache.get('key') == 'new'
+
+    asyncio.run(scenario())
+
+
+def test_expired_entry_is_loaded_again() -> None:
+    async def scenario() -> None:
+        calls = 0
+
+        async def loader(key: str) -> tuple[int, datetime]:
+            nonlocal calls
+            calls += 1
+            return calls, datetime.now(timezone.utc) - timedelta(seconds=1)
+
+        cache: TtlCache[str, int] = TtlCache('test', loader, LOGGER)
+        assert await cache.get('key') == 1
+        assert await cache.get('key') == 2
+
+    asyncio.run(scenario())
+
+
+def test_expired_pinned_entry_is_served_stale_while_it_refreshes() -> None:
+    async def scenario() -> None:
+        clock = SimulatedClock(VALID_TO, speed=0)
+        calls = 0
+
+        async def loader(key: str) -> tuple[int, datetime]:
+            nonlocal calls
+            calls += 1
+            return calls, clock.now() + timedelta(minutes=5)
+
+        cache: TtlCache[str, int] = TtlCache('test', loader, LOGGER, clock=clock)
+        cache.pin({'key'}, max_staleness=timedelta(minutes=1))
+        assert await cache.get('key') == 1
+
+        clock.advance(timedelta(minutes=5, seconds=30))
+        assert await cache.get('key') == 1
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert await cache.get('key') == 2
+
+        # Past the pinned limit a read waits for upstream again.
+        clock.advance(timedelta(minutes=7))
+        assert await cache.get('key') == 3
+
+    asyncio.run(scenario())
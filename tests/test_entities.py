@@ -0,0 +1,17 @@
+from types import SimpleNamespace
+
+from custom_components.ktw_its.sensor import KtwItsSensorEntity, KtwItsSensorEntityDescription
+
+
+def test_sensor_turns_unavailable_when_its_key_disappears() -> None:
+    description = KtwItsSensorEntityDescription(group='traffic', key='ktw_its_traffic_segment_1_speed')
+    coordinator = SimpleNamespace(data={description.key: object()}, last_update_success=True)
+    entity = KtwItsSensorEntity(coordinator=coordinator, entity_description=description)
+    assert entity.available
+
+    coordinator.data = {}
+    assert not entity.available
+
+    coordinator.data = {description.key: object()}
+    coordinator.last_update_success = False
+    assert not entity.available